@@ -0,0 +1,338 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmarks run against a locally cached model; never reach for the network mid-run.
+# Set HF_HUB_OFFLINE=0 to allow downloads.
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", os.environ["HF_HUB_OFFLINE"])
+
+import sentiment as sa
+from email_sources import iter_source
+from poc_data import email_categories, file_label, generate_email_content
+
+def load_records(source, repeat=1):
+    """
+    Reads the emails in source into memory, repeated to build a larger corpus.
+    Repeated copies get distinct ids so results can still be told apart.
+    """
+    records = list(iter_source(source))
+    return [(f"{email_id}#{i}", content) for i in range(repeat) for email_id, content in records]
+
+def time_results(results):
+    """
+    Consumes a results iterator and returns (count, seconds).
+    """
+    start = time.perf_counter()
+    count = sum(1 for _ in results)
+    return count, time.perf_counter() - start
+
+def bench_parallel(records, workers_list, batch_size=32):
+    """
+    Compares the serial loop against score_emails_parallel for each worker count.
+    Returns a list of result rows. Parallel timings include worker start-up and model loading,
+    since every real run pays for them too.
+    """
+    model = sa.load_model()
+    rows = []
+    for label, batch in (("serial, batch 1", 1), (f"serial, batch {batch_size}", batch_size)):
+        count, seconds = time_results(sa.score_emails(records, model, batch_size=batch))
+        rows.append({"mode": label, "workers": 1, "emails": count, "seconds": seconds})
+    for workers in workers_list:
+        count, seconds = time_results(sa.score_emails_parallel(records, workers, batch_size=batch_size))
+        rows.append({"mode": f"parallel, batch {batch_size}", "workers": workers, "emails": count,
+                     "seconds": seconds})
+    baseline = rows[0]["emails"] / rows[0]["seconds"]
+    for row in rows:
+        row["emails_per_second"] = row["emails"] / row["seconds"]
+        row["speedup"] = row["emails_per_second"] / baseline
+    return rows
+
+def build_corpus(size, seed=0):
+    """
+    Builds an in-memory corpus of size synthetic emails with poc_data.generate_email_content,
+    cycling through the categories. The same seed always gives the same corpus.
+    """
+    rng = random.Random(seed)
+    categories = list(email_categories)
+    return [(f"{file_label(categories[i % len(categories)])}_{i + 1}",
+             generate_email_content(categories[i % len(categories)], rng)) for i in range(size)]
+
+def percentile(values, fraction):
+    """
+    Returns the nearest-rank percentile of values (fraction between 0 and 1).
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+def peak_rss_mb():
+    """
+    Returns the peak resident set size of this process, in MB, since start-up or the last reset_peak_rss.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def reset_peak_rss():
+    """
+    Starts a stage's memory measurement and returns its baseline in MB for summarize.
+    On Linux the kernel's peak RSS counter is reset to the current RSS, so each stage reports its own
+    peak. Elsewhere ru_maxrss cannot be reset, and the growth only shows how far a stage raised the
+    process-wide peak.
+    """
+    try:
+        with open("/proc/self/clear_refs", 'w') as file:
+            file.write("5")
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+def summarize(stage, size, emails, seconds, latencies=None, batch_size=None, rss_baseline=None):
+    """
+    Builds one result row. latencies are per-call timings in seconds (per email, or per batch for inference).
+    rss_baseline is the reset_peak_rss value taken when the stage started; rss_growth_mb is the peak
+    memory the stage added on top of it.
+    """
+    peak = peak_rss_mb()
+    return {"stage": stage, "size": size, "batch_size": batch_size, "emails": emails, "seconds": seconds,
+            "emails_per_second": emails / seconds if seconds else None,
+            "p50_ms": 1000 * percentile(latencies, 0.50) if latencies else None,
+            "p99_ms": 1000 * percentile(latencies, 0.99) if latencies else None,
+            "peak_rss_mb": peak, "rss_growth_mb": peak - rss_baseline if rss_baseline is not None else None}
+
+def time_calls(function, items):
+    """
+    Calls function on every item and returns (outputs, per-call seconds, total seconds).
+    """
+    outputs = []
+    latencies = []
+    clock = time.perf_counter
+    total_start = clock()
+    for item in items:
+        start = clock()
+        outputs.append(function(item))
+        latencies.append(clock() - start)
+    return outputs, latencies, clock() - total_start
+
+def bench_inference(model, texts, batch_sizes, size):
+    """
+    Times the model over texts at each batch size, one row per batch size.
+    """
+    rows = []
+    for batch_size in batch_sizes:
+        batches = [texts[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+        baseline = reset_peak_rss()
+        _, latencies, seconds = time_calls(lambda batch: sa.classify_batch(model, batch, batch_size), batches)
+        rows.append(summarize("inference", size, len(texts), seconds, latencies, batch_size, baseline))
+    return rows
+
+def bench_full_run(model, records, size, batch_size):
+    """
+    Times process_emails end to end over records written as loose files, without the per-email output.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        for email_id, content in records:
+            with open(os.path.join(directory, f"{email_id}.txt"), 'w', encoding='utf-8') as file:
+                file.write(content)
+        baseline = reset_peak_rss()
+        start = time.perf_counter()
+        sa.process_emails(directory, model, batch_size, quiet=True)
+        seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(directory)
+    return summarize("process_emails", size, len(records), seconds, batch_size=batch_size, rss_baseline=baseline)
+
+def measure_import_seconds():
+    """
+    Times a cold `import sentiment` (which imports transformers and torch) in a fresh interpreter.
+    """
+    code = "import time; start = time.perf_counter(); import sentiment; print(time.perf_counter() - start)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    return float(output.stdout.strip().splitlines()[-1])
+
+def run_suite(sizes, batch_sizes=(1, 8, 32, 64), model_emails=512, backend="pytorch", model_path=None,
+              include_model=True, seed=0):
+    """
+    Benchmarks each stage on synthetic corpora of the given sizes: normalize_text and heuristic_check
+    per email, model inference at each batch size (on the first model_emails texts), and a full
+    process_emails run. Returns a machine-readable dict of environment metadata and result rows.
+    """
+    results = {"meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                        "platform": platform.platform(), "cpu_count": os.cpu_count(), "backend": backend,
+                        "seed": seed},
+               "results": []}
+    model = None
+    if include_model:
+        results["meta"]["import_seconds"] = measure_import_seconds()
+        baseline = reset_peak_rss()
+        start = time.perf_counter()
+        model = sa.load_model(backend, model_path)
+        results["meta"]["model_load_seconds"] = time.perf_counter() - start
+        results["meta"]["model_load_rss_mb"] = peak_rss_mb() - baseline
+    for size in sizes:
+        records = build_corpus(size, seed)
+        baseline = reset_peak_rss()
+        texts, latencies, seconds = time_calls(sa.normalize_text, [content for _, content in records])
+        results["results"].append(summarize("normalize_text", size, size, seconds, latencies, rss_baseline=baseline))
+        baseline = reset_peak_rss()
+        _, latencies, seconds = time_calls(sa.heuristic_check, texts)
+        results["results"].append(summarize("heuristic_check", size, size, seconds, latencies, rss_baseline=baseline))
+        if model is not None:
+            results["results"].extend(bench_inference(model, texts[:model_emails], batch_sizes, size))
+            results["results"].append(bench_full_run(model, records, size, max(batch_sizes)))
+    return results
+
+def result_key(row):
+    return row["stage"], row["size"], row["batch_size"]
+
+def compare_results(baseline, current, tolerance=0.10):
+    """
+    Compares throughput of matching rows in two run_suite results.
+    Returns rows with the relative change; a row regresses when throughput drops by more than tolerance.
+    """
+    base_rows = {result_key(row): row for row in baseline["results"]}
+    rows = []
+    for row in current["results"]:
+        base = base_rows.get(result_key(row))
+        if base is None or not base["emails_per_second"] or row["emails_per_second"] is None:
+            continue
+        change = row["emails_per_second"] / base["emails_per_second"] - 1
+        rows.append({"stage": row["stage"], "size": row["size"], "batch_size": row["batch_size"],
+                     "baseline": base["emails_per_second"], "current": row["emails_per_second"],
+                     "change": change, "regression": change < -tolerance})
+    return rows
+
+def print_suite_rows(results):
+    meta = results["meta"]
+    if "model_load_seconds" in meta:
+        print(f"import: {meta['import_seconds']:.2f}s  model load: {meta['model_load_seconds']:.2f}s")
+    print(f"{'stage':<17}{'size':>9}{'batch':>7}{'emails/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'peak MB':>10}"
+          f"{'growth MB':>11}")
+    for row in results["results"]:
+        p50 = f"{row['p50_ms']:.3f}" if row["p50_ms"] is not None else "-"
+        p99 = f"{row['p99_ms']:.3f}" if row["p99_ms"] is not None else "-"
+        growth = f"{row['rss_growth_mb']:.1f}" if row.get("rss_growth_mb") is not None else "-"
+        print(f"{row['stage']:<17}{row['size']:>9}{row['batch_size'] or '-':>7}{row['emails_per_second']:>12.1f}"
+              f"{p50:>10}{p99:>10}{row['peak_rss_mb']:>10.1f}{growth:>11}")
+
+def print_comparison_rows(rows):
+    print(f"{'stage':<17}{'size':>9}{'batch':>7}{'baseline/s':>12}{'current/s':>12}{'change':>9}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['stage']:<17}{row['size']:>9}{row['batch_size'] or '-':>7}{row['baseline']:>12.1f}"
+              f"{row['current']:>12.1f}{row['change']:>+9.1%}{flag}")
+
+def compare_backends(records, backends=sa.BACKENDS, model_path=None, batch_size=32):
+    """
+    Runs every email in records through the model with each backend and compares them with the first.
+    Reports load time, latency per batch, throughput, agreement on the model's POSITIVE/NEGATIVE
+    label and drift of the probability of POSITIVE on the normalized texts, skipping the heuristics
+    so every email reaches the model.
+    """
+    texts = [sa.normalize_text(content) for _, content in records]
+    runs = []
+    for backend in backends:
+        start = time.perf_counter()
+        model = sa.load_model(backend, model_path)
+        load_seconds = time.perf_counter() - start
+        batch_seconds = []
+        outputs = []
+        for begin in range(0, len(texts), batch_size):
+            start = time.perf_counter()
+            outputs.extend(sa.classify_batch(model, texts[begin:begin + batch_size], batch_size))
+            batch_seconds.append(time.perf_counter() - start)
+        runs.append((backend, load_seconds, batch_seconds, outputs))
+
+    rows = []
+    reference = runs[0][3]
+    for backend, load_seconds, batch_seconds, outputs in runs:
+        drift = [abs(sa.positive_score(output) - sa.positive_score(base)) for output, base in zip(outputs, reference)]
+        agreement = sum(output["label"] == base["label"] for output, base in zip(outputs, reference))
+        total = sum(batch_seconds)
+        rows.append({"backend": backend, "load_seconds": load_seconds,
+                     "mean_batch_ms": 1000 * total / len(batch_seconds) if batch_seconds else 0.0,
+                     "emails_per_second": len(texts) / total if total else 0.0,
+                     "label_agreement": agreement / len(texts) if texts else 1.0,
+                     "mean_score_drift": sum(drift) / len(drift) if drift else 0.0,
+                     "max_score_drift": max(drift, default=0.0)})
+    return rows
+
+def print_backend_rows(rows):
+    print(f"{'backend':<10}{'load s':>8}{'batch ms':>10}{'emails/s':>10}{'agreement':>11}"
+          f"{'mean drift':>12}{'max drift':>11}")
+    for row in rows:
+        print(f"{row['backend']:<10}{row['load_seconds']:>8.2f}{row['mean_batch_ms']:>10.1f}"
+              f"{row['emails_per_second']:>10.1f}{row['label_agreement']:>11.1%}"
+              f"{row['mean_score_drift']:>12.4f}{row['max_score_drift']:>11.4f}")
+
+def print_rows(rows):
+    print(f"{'mode':<24}{'workers':>8}{'emails':>10}{'seconds':>10}{'emails/s':>12}{'speedup':>9}")
+    for row in rows:
+        print(f"{row['mode']:<24}{row['workers']:>8}{row['emails']:>10}{row['seconds']:>10.2f}"
+              f"{row['emails_per_second']:>12.1f}{row['speedup']:>8.2f}x")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the email sentiment pipeline.")
+    parser.add_argument("--source", default="test_emails", help="Email source to use as the corpus")
+    parser.add_argument("--repeat", type=int, default=100, help="Times to repeat the corpus")
+    parser.add_argument("--batch-size", type=int, default=32, help="Emails per model forward pass")
+    commands = parser.add_subparsers(dest="command")
+    parallel = commands.add_parser("parallel", help="Compare serial and multi-process scoring")
+    parallel.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8], help="Worker counts to compare")
+    backends = commands.add_parser("backends", help="Compare inference backends for parity and speed")
+    backends.add_argument("--backends", nargs="+", choices=sa.BACKENDS, default=list(sa.BACKENDS),
+                          help="Backends to compare; the first is the reference")
+    backends.add_argument("--model-path", default=None, help="Local model directory")
+    suite = commands.add_parser("suite", help="Benchmark every stage on synthetic corpora")
+    suite.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Corpus sizes")
+    suite.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 64], help="Inference batch sizes")
+    suite.add_argument("--model-emails", type=int, default=512, help="Emails per inference measurement")
+    suite.add_argument("--backend", choices=sa.BACKENDS, default="pytorch", help="Model inference backend")
+    suite.add_argument("--model-path", default=None, help="Local model directory")
+    suite.add_argument("--no-model", action="store_true", help="Only benchmark the stages that need no model")
+    suite.add_argument("--seed", type=int, default=0, help="Seed for the synthetic corpus")
+    suite.add_argument("--output", default=None, help="Write results as JSON to this file")
+    compare = commands.add_parser("compare", help="Compare two suite results for regressions")
+    compare.add_argument("baseline", help="Baseline results JSON")
+    compare.add_argument("current", help="Current results JSON")
+    compare.add_argument("--tolerance", type=float, default=0.10, help="Allowed throughput drop, as a fraction")
+    args = parser.parse_args(argv)
+
+    if args.command == "suite":
+        results = run_suite(args.sizes, args.batch_sizes, args.model_emails, args.backend, args.model_path,
+                            include_model=not args.no_model, seed=args.seed)
+        print_suite_rows(results)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2)
+        return 0
+    if args.command == "compare":
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        with open(args.current, encoding='utf-8') as file:
+            current = json.load(file)
+        rows = compare_results(baseline, current, args.tolerance)
+        print_comparison_rows(rows)
+        return 1 if any(row["regression"] for row in rows) else 0
+
+    records = load_records(args.source, args.repeat)
+    print(f"Benchmarking {len(records)} emails on {os.cpu_count()} cores")
+    if args.command == "backends":
+        print_backend_rows(compare_backends(records, args.backends, args.model_path, args.batch_size))
+    else:
+        print_rows(bench_parallel(records, getattr(args, "workers", [2, 4, 8]), args.batch_size))
+
+if __name__ == "__main__":
+    sys.exit(main())
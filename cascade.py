@@ -0,0 +1,248 @@
+import argparse
+import os
+import random
+import re
+import sys
+import time
+import zlib
+import numpy as np
+import sentiment as sa
+from evaluate import CLASSES, iter_labeled, load_labels
+from poc_data import email_categories, generate_realistic_email
+
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+# Every text gets this feature, so it acts as the per-class bias
+BIAS_FEATURE = "\0bias"
+
+class NgramClassifier:
+    """
+    Multinomial logistic regression over hashed word n-grams of normalized text.
+    Features are the crc32 hashes of lower-cased word n-grams modulo n_features, L2-normalized per
+    text, so the model is a fixed-size weight table that scores an email in microseconds.
+    Used as a cascade stage: a prediction is accepted when the margin between the two most likely
+    classes is at least margin, and escalated to the transformer otherwise.
+    """
+
+    def __init__(self, n_features=2 ** 18, ngrams=2, margin=0.5, classes=CLASSES):
+        self.n_features = n_features
+        self.ngrams = ngrams
+        self.margin = margin
+        self.classes = tuple(classes)
+        self.weights = np.zeros((n_features, len(self.classes)), dtype=np.float32)
+        self.path = None
+
+    def features(self, text):
+        """
+        Returns the hashed feature indices of text, including the bias feature.
+        """
+        words = WORD_PATTERN.findall(text.lower())
+        grams = [BIAS_FEATURE]
+        for n in range(1, self.ngrams + 1):
+            grams.extend(' '.join(words[i:i + n]) for i in range(len(words) - n + 1))
+        return np.fromiter((zlib.crc32(gram.encode('utf-8')) % self.n_features for gram in grams), dtype=np.int64)
+
+    def _batch(self, texts):
+        rows = [self.features(text) for text in texts]
+        lengths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+        indices = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        values = np.repeat(1 / np.sqrt(lengths), lengths).astype(np.float32)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        return indices, values, offsets, lengths
+
+    def _logits(self, indices, values, offsets):
+        return np.add.reduceat(self.weights[indices] * values[:, None], offsets, axis=0)
+
+    def predict_proba(self, texts):
+        """
+        Returns class probabilities for texts as an array of shape (len(texts), len(classes)).
+        """
+        if not texts:
+            return np.zeros((0, len(self.classes)), dtype=np.float32)
+        indices, values, offsets, _ = self._batch(texts)
+        return _softmax(self._logits(indices, values, offsets))
+
+    def predict(self, texts):
+        """
+        Returns (labels, probabilities, margins): the most likely class of each text, its
+        probability, and its lead over the runner-up.
+        """
+        probabilities = self.predict_proba(texts)
+        ranked = np.sort(probabilities, axis=1)
+        best = probabilities.argmax(axis=1)
+        labels = [self.classes[i] for i in best]
+        return labels, ranked[:, -1], ranked[:, -1] - ranked[:, -2]
+
+    def fit(self, texts, labels, epochs=5, batch_size=256, learning_rate=2.0, seed=0):
+        """
+        Trains on normalized texts and their labels with mini-batch gradient descent on the
+        cross-entropy loss. Returns self.
+        """
+        targets = np.array([self.classes.index(label) for label in labels], dtype=np.int64)
+        rng = np.random.default_rng(seed)
+        for _ in range(epochs):
+            order = rng.permutation(len(texts))
+            for start in range(0, len(order), batch_size):
+                rows = order[start:start + batch_size]
+                indices, values, offsets, lengths = self._batch([texts[i] for i in rows])
+                gradient = _softmax(self._logits(indices, values, offsets))
+                gradient[np.arange(len(rows)), targets[rows]] -= 1
+                updates = np.repeat(gradient, lengths, axis=0) * values[:, None]
+                np.add.at(self.weights, indices, (-learning_rate / len(rows)) * updates)
+        return self
+
+    def save(self, path):
+        np.savez_compressed(path, weights=self.weights, classes=np.array(self.classes),
+                            settings=np.array([self.n_features, self.ngrams]), margin=np.array(self.margin))
+        self.path = path
+
+    @classmethod
+    def load(cls, path, margin=None):
+        """
+        Loads a classifier saved with save; margin overrides the stored confidence threshold.
+        """
+        with np.load(path) as stored:
+            n_features, ngrams = (int(value) for value in stored["settings"])
+            classifier = cls(n_features, ngrams, float(stored["margin"]) if margin is None else margin,
+                             [str(name) for name in stored["classes"]])
+            classifier.weights = stored["weights"]
+        classifier.path = path
+        return classifier
+
+def _softmax(logits):
+    exponentials = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exponentials / exponentials.sum(axis=1, keepdims=True)
+
+def synthetic_examples(count, seed=0, **options):
+    """
+    Returns (texts, labels) for count normalized poc_data emails, with categories drawn evenly.
+    """
+    rng = random.Random(seed)
+    labels = rng.choices(list(email_categories), k=count)
+    return [sa.normalize_text(generate_realistic_email(label, rng, **options)) for label in labels], labels
+
+def labeled_examples(source, labels=None):
+    """
+    Returns (texts, labels) for the labeled emails in source, normalized.
+    """
+    texts, targets = [], []
+    for _, body, label in iter_labeled(source, labels):
+        if label is not None:
+            texts.append(sa.normalize_text(body))
+            targets.append(label)
+    return texts, targets
+
+def margin_report(true, predicted, margins, thresholds):
+    """
+    For each margin threshold, returns the share of emails escalated to the transformer and the
+    accuracy of the cascade on the emails it keeps.
+    """
+    correct = np.asarray(true) == np.asarray(predicted)
+    margins = np.asarray(margins)
+    kept = margins[None, :] >= np.asarray(thresholds)[:, None]
+    kept_counts = kept.sum(axis=1)
+    accuracy = np.divide((kept & correct[None, :]).sum(axis=1), kept_counts,
+                         out=np.zeros(len(thresholds)), where=kept_counts > 0)
+    return [{"margin": float(threshold), "escalation_rate": float(1 - count / len(margins)) if len(margins) else 0.0,
+             "cascade_accuracy": float(value)} for threshold, count, value in zip(thresholds, kept_counts, accuracy)]
+
+def evaluate_cascade(texts, labels, classifier, model=None, batch_size=32, matcher=None):
+    """
+    Runs labeled normalized texts through heuristics, the cascade and (with model) the transformer,
+    and returns per-stage email counts and accuracy plus the overall accuracy and escalation rate.
+    Without a model, escalated emails are counted but not scored.
+    """
+    stages = {name: {"emails": 0, "correct": 0} for name in ("heuristic", "cascade", "model")}
+    remaining = []
+    for text, label in zip(texts, labels):
+        verdict = sa.heuristic_check(text, matcher)
+        if verdict is None:
+            remaining.append((text, label))
+        else:
+            stages["heuristic"]["emails"] += 1
+            stages["heuristic"]["correct"] += verdict == label
+    predicted, _, margins = classifier.predict([text for text, _ in remaining])
+    escalated = []
+    for (text, label), prediction, margin in zip(remaining, predicted, margins):
+        if margin >= classifier.margin:
+            stages["cascade"]["emails"] += 1
+            stages["cascade"]["correct"] += prediction == label
+        else:
+            escalated.append((text, label))
+    stages["model"]["emails"] = len(escalated)
+    if model is not None and escalated:
+        outputs = sa.classify_batch(model, [text for text, _ in escalated], batch_size)
+        stages["model"]["correct"] = sum(sa.score_to_label(sa.positive_score(output)) == label
+                                         for output, (_, label) in zip(outputs, escalated))
+    for stage in stages.values():
+        stage["accuracy"] = stage["correct"] / stage["emails"] if stage["emails"] else 0.0
+    scored = sum(stage["emails"] for name, stage in stages.items() if name != "model" or model is not None)
+    return {"stages": stages, "escalation_rate": len(escalated) / len(remaining) if remaining else 0.0,
+            "accuracy": sum(stage["correct"] for stage in stages.values()) / scored if scored else 0.0,
+            "model_scored": model is not None}
+
+def print_margin_rows(rows):
+    print(f"{'margin':>8}{'escalated':>12}{'cascade acc':>14}")
+    for row in rows:
+        print(f"{row['margin']:>8.2f}{row['escalation_rate']:>12.1%}{row['cascade_accuracy']:>14.1%}")
+
+def print_stage_rows(report):
+    print(f"{'stage':<12}{'emails':>10}{'accuracy':>10}")
+    for name, stage in report["stages"].items():
+        print(f"{name:<12}{stage['emails']:>10}{stage['accuracy']:>10.1%}")
+    scope = "overall accuracy" if report["model_scored"] else "accuracy without the model stage"
+    print(f"Escalation rate: {report['escalation_rate']:.1%}, {scope}: {report['accuracy']:.1%}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train and evaluate the hashed n-gram cascade classifier.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="Train the classifier offline")
+    train.add_argument("--source", default=None, help="Labeled emails to train on (default: synthetic poc_data emails)")
+    train.add_argument("--labels", default=None, help="CSV (id,label) or JSONL file of true labels")
+    train.add_argument("--count", type=int, default=50000, help="Synthetic emails to generate without --source")
+    train.add_argument("--seed", type=int, default=0, help="Seed for synthetic emails and shuffling")
+    train.add_argument("--epochs", type=int, default=5, help="Passes over the training data")
+    train.add_argument("--margin", type=float, default=0.5, help="Default confidence margin stored with the model")
+    train.add_argument("--holdout", type=float, default=0.1, help="Share of emails held out for evaluation")
+    train.add_argument("--output", default="models/cascade.npz", help="Where to save the classifier")
+    tune = commands.add_parser("evaluate", help="Report escalation rate and per-stage accuracy")
+    tune.add_argument("source", help="Labeled emails: poc_data files, a JSONL or .pack corpus, or any source with --labels")
+    tune.add_argument("--labels", default=None, help="CSV (id,label) or JSONL file of true labels")
+    tune.add_argument("--model", default="models/cascade.npz", help="Trained classifier")
+    tune.add_argument("--margin", type=float, default=None, help="Confidence margin (default: the stored one)")
+    tune.add_argument("--transformer", action="store_true", help="Also score escalated emails with the transformer")
+    tune.add_argument("--backend", choices=sa.BACKENDS, default="pytorch", help="Model inference backend")
+    tune.add_argument("--model-path", default=None, help="Local model directory")
+    args = parser.parse_args(argv)
+
+    labels = load_labels(args.labels) if args.labels else None
+    if args.command == "train":
+        if args.source:
+            texts, targets = labeled_examples(args.source, labels)
+        else:
+            texts, targets = synthetic_examples(args.count, args.seed)
+        # Sources such as poc_data directories come grouped by class, so shuffle before holding out
+        order = np.random.default_rng(args.seed).permutation(len(texts))
+        texts, targets = [texts[i] for i in order], [targets[i] for i in order]
+        split = len(texts) - int(len(texts) * args.holdout)
+        classifier = NgramClassifier(margin=args.margin)
+        start = time.perf_counter()
+        classifier.fit(texts[:split], targets[:split], epochs=args.epochs, seed=args.seed)
+        print(f"Trained on {split} emails in {time.perf_counter() - start:.1f}s")
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        classifier.save(args.output)
+        if split < len(texts):
+            predicted, _, margins = classifier.predict(texts[split:])
+            print_margin_rows(margin_report(targets[split:], predicted, margins, np.arange(0, 1, 0.1)))
+        return 0
+
+    classifier = NgramClassifier.load(args.model, args.margin)
+    texts, targets = labeled_examples(args.source, labels)
+    predicted, _, margins = classifier.predict(texts)
+    print_margin_rows(margin_report(targets, predicted, margins, np.arange(0, 1, 0.1)))
+    model = sa.load_model(args.backend, args.model_path) if args.transformer else None
+    print(f"\nCascade at margin {classifier.margin:.2f}:")
+    print_stage_rows(evaluate_cascade(texts, targets, classifier, model))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import re
+import zlib
+from collections import OrderedDict
+import numpy as np
+
+# Prime just above 2**32 for the (a * x + b) mod p MinHash permutations of 32-bit shingle hashes
+MINHASH_PRIME = np.uint64(4294967311)
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+def lsh_bands(threshold, num_perm):
+    """
+    Picks (bands, rows) with bands * rows == num_perm whose LSH collision curve crosses 50% at
+    the similarity closest to threshold, so pairs near the threshold become candidates.
+    """
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    return min(options, key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - threshold))
+
+class NearDuplicateIndex:
+    """
+    Finds near-identical normalized texts with MinHash signatures over word shingles and
+    banded locality-sensitive hashing. Candidates that share a band are confirmed by their
+    estimated Jaccard similarity, so only pairs at or above threshold match.
+    The index holds the most recent max_entries representatives; older ones are dropped first.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=128, shingle_size=2, max_entries=100000, seed=1):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Similarity threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 31, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 2 ** 31, num_perm, dtype=np.uint64)
+        self.entries = OrderedDict()
+        self.buckets = {}
+        self.next_key = 0
+        self.queries = 0
+        self.matches = 0
+
+    def shingles(self, text):
+        """
+        Returns the lower-cased word n-grams of text; texts shorter than one shingle are a single shingle.
+        """
+        words = WORD_PATTERN.findall(text.lower())
+        size = self.shingle_size
+        if len(words) <= size:
+            return {' '.join(words)}
+        return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    def signature(self, text):
+        """
+        Returns the MinHash signature of text as an array of num_perm values.
+        """
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in self.shingles(text)),
+                             dtype=np.uint64)
+        return ((np.outer(hashes, self.a) + self.b) % MINHASH_PRIME).min(axis=0)
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def query(self, signature):
+        """
+        Returns (value, similarity) for the most similar stored entry at or above threshold, or None.
+        """
+        self.queries += 1
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self.buckets.get(band_key, ()))
+        best = None
+        for key in candidates:
+            stored, value = self.entries[key]
+            similarity = float(np.count_nonzero(stored == signature)) / self.num_perm
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (value, similarity)
+        if best is not None:
+            self.matches += 1
+        return best
+
+    def add(self, signature, value):
+        """
+        Stores value under signature and returns its key.
+        """
+        key = self.next_key
+        self.next_key += 1
+        self.entries[key] = (signature, value)
+        for band_key in self._band_keys(signature):
+            self.buckets.setdefault(band_key, []).append(key)
+        if len(self.entries) > self.max_entries:
+            self.remove(next(iter(self.entries)))
+        return key
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for band_key in self._band_keys(entry[0]):
+            bucket = self.buckets[band_key]
+            bucket.remove(key)
+            if not bucket:
+                del self.buckets[band_key]
+
+    def stats(self):
+        return {"entries": len(self.entries), "queries": self.queries, "matches": self.matches,
+                "match_rate": self.matches / self.queries if self.queries else 0.0}
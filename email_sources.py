@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+import re
+import struct
+from email import policy
+from email.parser import BytesParser
+
+# Lazy email sources. Every source is a generator of (email_id, body) so a run never
+# holds more than one message in memory, whatever the size of the mailbox.
+
+# Packed corpus format written by poc_data.generate_corpus: PACK_MAGIC, then per email a
+# PACK_RECORD header (id length, label code, body length) followed by the UTF-8 id and body.
+PACK_MAGIC = b"SNPK1\n"
+PACK_RECORD = struct.Struct('<HBI')
+PACK_LABELS = ("interested", "neutral", "not interested")
+PACK_NO_LABEL = 255
+
+HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+QUOTED_FROM_PATTERN = re.compile(rb'>+From ')
+MAILDIR_SUBDIRECTORIES = ("new", "cur")
+CORPUS_SUFFIXES = ('.jsonl', '.ndjson', '.pack')
+
+def parse_message(data):
+    """
+    Parses raw RFC 822 bytes into an EmailMessage.
+    """
+    return BytesParser(policy=policy.default).parsebytes(data)
+
+def extract_text(message):
+    """
+    Returns the reply text of a parsed message: the text/plain body, or the HTML body with tags removed.
+    """
+    body = message.get_body(preferencelist=('plain', 'html'))
+    if body is None:
+        return ''
+    try:
+        text = body.get_content()
+    except (LookupError, UnicodeError):
+        # Unknown or wrong charset declared: fall back to a lossy decode
+        text = body.get_payload(decode=True).decode('utf-8', errors='replace')
+    if body.get_content_subtype() == 'html':
+        text = HTML_TAG_PATTERN.sub(' ', text)
+    return text
+
+def read_message_file(path, mime=False):
+    """
+    Reads one message file: MIME if mime is set or the file ends in .eml, plain text otherwise.
+    """
+    if mime or path.endswith('.eml'):
+        with open(path, 'rb') as file:
+            return extract_text(parse_message(file.read()))
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+def iter_text_file(path):
+    """
+    Yields the single plain-text email stored in path.
+    """
+    yield path, read_message_file(path)
+
+def iter_eml(path):
+    """
+    Yields the text of the single MIME message stored in path.
+    """
+    yield path, read_message_file(path, mime=True)
+
+def iter_directory_files(path, suffixes=('.txt', '.eml'), skip=None):
+    """
+    Yields (path, mime) for the message files in a directory as os.scandir lists them,
+    without building a file list. skip, if given, is called with (path, os.stat_result)
+    and files it returns True for are left out.
+    """
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if not entry.name.endswith(suffixes) or not entry.is_file():
+                continue
+            if skip is not None and skip(entry.path, entry.stat()):
+                continue
+            yield entry.path, entry.name.endswith('.eml')
+
+def is_maildir(path):
+    return all(os.path.isdir(os.path.join(path, name)) for name in ("cur", "new", "tmp"))
+
+def iter_maildir_files(path, skip=None):
+    """
+    Yields (path, mime) for the messages of a Maildir tree, including Maildir++ subfolders.
+    skip works as in iter_directory_files.
+    """
+    folders = [path]
+    while folders:
+        folder = folders.pop()
+        with os.scandir(folder) as entries:
+            folders.extend(entry.path for entry in entries
+                           if entry.name not in ("cur", "new", "tmp") and entry.is_dir())
+        for subdirectory in MAILDIR_SUBDIRECTORIES:
+            message_directory = os.path.join(folder, subdirectory)
+            if not os.path.isdir(message_directory):
+                continue
+            with os.scandir(message_directory) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+                    if skip is not None and skip(entry.path, entry.stat()):
+                        continue
+                    yield entry.path, True
+
+def iter_directory(path, suffixes=('.txt', '.eml'), skip=None):
+    """
+    Yields emails from the .txt and .eml files in a directory, reading one file at a time, then
+    from the corpus shards it holds (see iter_corpus).
+    """
+    for filepath, mime in iter_directory_files(path, suffixes, skip):
+        yield filepath, read_message_file(filepath, mime)
+    yield from iter_corpus(path)
+
+def iter_maildir(path, skip=None):
+    """
+    Yields emails from a Maildir tree, walking it with os.scandir.
+    """
+    for filepath, mime in iter_maildir_files(path, skip):
+        yield filepath, read_message_file(filepath, mime)
+
+def iter_mbox(path):
+    """
+    Yields emails from an mbox file, reading it line by line.
+    Only the current message is buffered. Ids are "<path>#<message number>".
+    """
+    index = 0
+    lines = []
+    previous_blank = True
+    with open(path, 'rb') as file:
+        for line in file:
+            if line.startswith(b'From ') and previous_blank:
+                if lines:
+                    yield f"{path}#{index}", extract_text(parse_message(b''.join(lines)))
+                    index += 1
+                lines = []
+            elif lines or line.strip():
+                # Undo mboxrd "From " quoting
+                lines.append(line[1:] if QUOTED_FROM_PATTERN.match(line) else line)
+            previous_blank = not line.strip()
+        if lines:
+            yield f"{path}#{index}", extract_text(parse_message(b''.join(lines)))
+
+def iter_jsonl(path, id_field="id", body_field="body", with_labels=False, label_field="label"):
+    """
+    Yields emails from a JSON Lines file, one object per line, as (email_id, body), or
+    (email_id, body, label) with with_labels. Ids default to "<path>#<line number>" when an
+    object has no id_field.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                logging.error(f"Skipping invalid JSON at {path}:{line_number}: {e}")
+                continue
+            email_id, body = str(record.get(id_field, f"{path}#{line_number}")), record.get(body_field) or ''
+            if with_labels:
+                yield email_id, body, record.get(label_field)
+            else:
+                yield email_id, body
+
+def iter_packed(path, with_labels=False):
+    """
+    Yields (email_id, body), or (email_id, body, label) with with_labels, from a packed corpus file.
+    Records are read one at a time.
+    """
+    with open(path, 'rb') as file:
+        if file.read(len(PACK_MAGIC)) != PACK_MAGIC:
+            raise ValueError(f"{path} is not a packed email corpus")
+        while True:
+            header = file.read(PACK_RECORD.size)
+            if not header:
+                return
+            if len(header) < PACK_RECORD.size:
+                raise ValueError(f"Truncated record header in {path}")
+            id_length, label_code, body_length = PACK_RECORD.unpack(header)
+            email_id = file.read(id_length).decode('utf-8')
+            body = file.read(body_length).decode('utf-8')
+            if with_labels:
+                yield email_id, body, PACK_LABELS[label_code] if label_code != PACK_NO_LABEL else None
+            else:
+                yield email_id, body
+
+def corpus_shards(path):
+    """
+    Returns the .jsonl and .pack corpus files in a directory, such as the shards written by
+    poc_data.generate_corpus, sorted by name.
+    """
+    with os.scandir(path) as entries:
+        return sorted(entry.path for entry in entries if entry.name.endswith(CORPUS_SUFFIXES) and entry.is_file())
+
+def iter_corpus(path, with_labels=False):
+    """
+    Yields emails from a JSONL or packed corpus file, or from every corpus shard in a directory
+    in name order, as iter_jsonl and iter_packed do.
+    """
+    for shard in corpus_shards(path) if os.path.isdir(path) else [path]:
+        if shard.endswith('.pack'):
+            yield from iter_packed(shard, with_labels)
+        else:
+            yield from iter_jsonl(shard, with_labels=with_labels)
+
+def iter_source_files(source, skip=None):
+    """
+    Returns a generator of (path, mime) when source stores one message per file (a directory
+    or Maildir tree), so callers can read the files concurrently; returns None otherwise,
+    including for directories that hold corpus shards.
+    """
+    if not os.path.isdir(source) or corpus_shards(source):
+        return None
+    if is_maildir(source):
+        return iter_maildir_files(source, skip)
+    return iter_directory_files(source, skip=skip)
+
+def iter_source(source, skip=None):
+    """
+    Yields (email_id, body) from a directory of .txt/.eml files and corpus shards, a Maildir tree,
+    an mbox file, a JSONL file, a packed .pack corpus, or a single .eml/.txt file, picked by the
+    shape and extension of source.
+    skip is only applied to file-per-message sources.
+    """
+    if os.path.isdir(source):
+        if is_maildir(source):
+            return iter_maildir(source, skip)
+        return iter_directory(source, skip=skip)
+    extension = os.path.splitext(source)[1].lower()
+    if extension in ('.mbox', '.mbx'):
+        return iter_mbox(source)
+    if extension in ('.jsonl', '.ndjson'):
+        return iter_jsonl(source)
+    if extension == '.pack':
+        return iter_packed(source)
+    if extension == '.eml':
+        return iter_eml(source)
+    if extension == '.txt':
+        return iter_text_file(source)
+    raise ValueError(f"Unsupported email source: {source}")
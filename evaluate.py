@@ -0,0 +1,284 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import deque
+import numpy as np
+import sentiment as sa
+from dedup import NearDuplicateIndex
+from email_sources import CORPUS_SUFFIXES, corpus_shards, iter_corpus, iter_jsonl, iter_source
+from score_cache import ScoreCache
+
+# Class order used for label codes, confusion matrix rows (true) and columns (predicted)
+CLASSES = ("interested", "neutral", "not interested")
+INTERESTED, NEUTRAL, NOT_INTERESTED = range(len(CLASSES))
+METRICS = ("macro_f1", "accuracy")
+
+# poc_data file names: interested_1.txt, neutral_2.txt, not_interested_3.txt (or the older "not interested_3.txt")
+FILENAME_LABEL_PATTERN = re.compile(r'(not[ _]interested|interested|neutral)_', re.IGNORECASE)
+
+def normalize_label(label):
+    """
+    Maps a label spelling such as "not_interested" or "Not Interested" to its entry in CLASSES.
+    Returns None for a missing label and raises ValueError for an unknown one.
+    """
+    if label is None or not str(label).strip():
+        return None
+    name = ' '.join(str(label).replace('_', ' ').lower().split())
+    if name not in CLASSES:
+        raise ValueError(f"Unknown label {label!r}, expected one of {', '.join(CLASSES)}")
+    return name
+
+def label_from_filename(path):
+    """
+    Returns the true label encoded in a poc_data file name, or None.
+    """
+    match = FILENAME_LABEL_PATTERN.match(os.path.basename(path))
+    return normalize_label(match.group(1)) if match else None
+
+def load_labels(path):
+    """
+    Reads true labels from a CSV file of id,label rows or a JSONL file of {"id", "label"} objects.
+    Ids may be full email ids or file base names.
+    """
+    if path.endswith(('.jsonl', '.ndjson')):
+        return {email_id: normalize_label(label) for email_id, _, label in iter_jsonl(path, with_labels=True)}
+    labels = {}
+    with open(path, newline='', encoding='utf-8') as file:
+        for row in csv.reader(file):
+            if len(row) < 2 or row[0] == "id":
+                continue
+            labels[row[0]] = normalize_label(row[1])
+    return labels
+
+def iter_labeled(source, labels=None):
+    """
+    Yields (email_id, body, label) from source. Labels come from the labels dict when given,
+    otherwise from the label stored in .pack and JSONL corpora (or a directory of their shards)
+    or the poc_data file name. label is None when it is unknown.
+    """
+    if source.endswith(CORPUS_SUFFIXES) or os.path.isdir(source) and corpus_shards(source):
+        records = iter_corpus(source, with_labels=True)
+    else:
+        records = ((email_id, body, label_from_filename(email_id)) for email_id, body in iter_source(source))
+    for email_id, body, label in records:
+        if labels is not None:
+            label = labels.get(email_id, labels.get(os.path.basename(email_id), label))
+        yield email_id, body, normalize_label(label)
+
+def collect_scores(records, model, batch_size=32, window=256, cache=None, dedup=None):
+    """
+    Runs labeled (email_id, body, label) records through the pipeline once and returns arrays for
+    threshold sweeps: ids, true label codes, model scores as the probability of POSITIVE from
+    sentiment.positive_score, the value score_to_label thresholds (NaN where a heuristic decided),
+    heuristic verdict codes (-1 where the model decided) and matched phrases.
+    Unlabeled emails and emails whose model batch failed are left out. With a NearDuplicateIndex,
+    near-duplicates carry their representative's score, so the sweep shows the accuracy cost of dedup.
+    """
+    expected = deque()
+    unlabeled = 0
+
+    def labeled():
+        nonlocal unlabeled
+        for email_id, body, label in records:
+            if label is None:
+                unlabeled += 1
+                continue
+            expected.append((email_id, CLASSES.index(label)))
+            yield email_id, body
+
+    ids, true, scores, heuristic, phrases = [], [], [], [], []
+    for result in sa.score_emails(labeled(), model, batch_size, window, cache=cache, dedup=dedup):
+        # Results come back in input order, minus failed batches
+        email_id, label = expected.popleft()
+        while email_id != result["id"]:
+            email_id, label = expected.popleft()
+        ids.append(email_id)
+        true.append(label)
+        if result["method"] == "heuristic":
+            scores.append(np.nan)
+            heuristic.append(CLASSES.index(result["label"]))
+        else:
+            scores.append(result["score"])
+            heuristic.append(-1)
+        phrases.append(result["phrase"] or '')
+    if unlabeled:
+        logging.warning(f"Skipped {unlabeled} emails without a true label")
+    return {"ids": np.array(ids, dtype=str), "true": np.array(true, dtype=np.int8),
+            "scores": np.array(scores, dtype=np.float64), "heuristic": np.array(heuristic, dtype=np.int8),
+            "phrases": np.array(phrases, dtype=str)}
+
+def save_scores(path, data):
+    np.savez_compressed(path, **data)
+
+def load_scores(path):
+    with np.load(path) as stored:
+        return {name: stored[name] for name in stored.files}
+
+def confusion_grid(true, scores, heuristic, not_interested_thresholds, interested_thresholds):
+    """
+    Returns confusion matrices for every threshold pair as an array of shape
+    (len(not_interested_thresholds), len(interested_thresholds), 3, 3), indexed [true, predicted].
+    Model-scored emails are labelled exactly as score_to_label would; heuristic verdicts are
+    added unchanged. Each class's scores are sorted once and counted with searchsorted, so the
+    whole grid costs a few array operations rather than a pass over the emails per pair.
+    """
+    nt = np.asarray(not_interested_thresholds, dtype=np.float64)
+    it = np.asarray(interested_thresholds, dtype=np.float64)
+    grid = np.zeros((len(nt), len(it), len(CLASSES), len(CLASSES)), dtype=np.int64)
+    model_rows = (heuristic < 0) & ~np.isnan(scores)
+    for label in range(len(CLASSES)):
+        class_scores = np.sort(scores[model_rows & (true == label)])
+        at_most = np.searchsorted(class_scores, it, side='right')
+        above = len(class_scores) - at_most
+        below = np.searchsorted(class_scores, nt, side='left')
+        # score_to_label tests the interested threshold first, so when nt > it only scores <= it are left
+        not_interested = np.where(nt[:, None] <= it[None, :], below[:, None], at_most[None, :])
+        grid[:, :, label, INTERESTED] = above[None, :]
+        grid[:, :, label, NOT_INTERESTED] = not_interested
+        grid[:, :, label, NEUTRAL] = len(class_scores) - above[None, :] - not_interested
+    heuristic_rows = heuristic >= 0
+    heuristic_confusion = np.zeros((len(CLASSES), len(CLASSES)), dtype=np.int64)
+    np.add.at(heuristic_confusion, (true[heuristic_rows], heuristic[heuristic_rows]), 1)
+    return grid + heuristic_confusion
+
+def classification_metrics(confusion):
+    """
+    Computes per-class precision, recall and F1, macro F1 and accuracy from confusion matrices
+    with shape (..., 3, 3). Undefined ratios (no predictions or no true emails) are 0.
+    """
+    confusion = np.asarray(confusion)
+    true_positives = np.diagonal(confusion, axis1=-2, axis2=-1).astype(np.float64)
+    predicted = confusion.sum(axis=-2)
+    actual = confusion.sum(axis=-1)
+    precision = np.divide(true_positives, predicted, out=np.zeros_like(true_positives), where=predicted > 0)
+    recall = np.divide(true_positives, actual, out=np.zeros_like(true_positives), where=actual > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros_like(true_positives),
+                   where=precision + recall > 0)
+    total = confusion.sum(axis=(-2, -1))
+    accuracy = np.divide(true_positives.sum(axis=-1), total, out=np.zeros(total.shape), where=total > 0)
+    return {"precision": precision, "recall": recall, "f1": f1, "macro_f1": f1.mean(axis=-1), "accuracy": accuracy}
+
+def _result(confusion, not_interested_threshold, interested_threshold):
+    values = classification_metrics(confusion)
+    return {"not_interested_threshold": float(not_interested_threshold),
+            "interested_threshold": float(interested_threshold),
+            "macro_f1": float(values["macro_f1"]), "accuracy": float(values["accuracy"]),
+            "classes": {name: {"precision": float(values["precision"][i]), "recall": float(values["recall"][i]),
+                               "f1": float(values["f1"][i]), "support": int(confusion[i].sum())}
+                        for i, name in enumerate(CLASSES)},
+            "confusion": confusion.tolist()}
+
+def evaluate_thresholds(data, not_interested_threshold=sa.NOT_INTERESTED_THRESHOLD,
+                        interested_threshold=sa.INTERESTED_THRESHOLD):
+    """
+    Scores one threshold pair against stored scores.
+    """
+    confusion = confusion_grid(data["true"], data["scores"], data["heuristic"],
+                               [not_interested_threshold], [interested_threshold])[0, 0]
+    return _result(confusion, not_interested_threshold, interested_threshold)
+
+def sweep(data, step=0.01, metric="macro_f1"):
+    """
+    Evaluates every threshold pair on a grid of the given step with not_interested <= interested,
+    and returns the best pair by metric ("macro_f1" or "accuracy") with its per-class report.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}, expected one of {', '.join(METRICS)}")
+    thresholds = np.round(np.arange(0, 1 + step / 2, step), 10)
+    confusion = confusion_grid(data["true"], data["scores"], data["heuristic"], thresholds, thresholds)
+    values = classification_metrics(confusion)[metric]
+    values = np.where(thresholds[:, None] <= thresholds[None, :], values, -1)
+    nt_index, it_index = np.unravel_index(np.argmax(values), values.shape)
+    result = _result(confusion[nt_index, it_index], thresholds[nt_index], thresholds[it_index])
+    result["pairs"] = int((values >= 0).sum())
+    return result
+
+def heuristic_report(data):
+    """
+    Returns coverage and accuracy of the heuristic verdicts, overall and per phrase.
+    """
+    rows = data["heuristic"] >= 0
+    correct = data["heuristic"][rows] == data["true"][rows]
+    phrases = {}
+    for phrase in np.unique(data["phrases"][rows]):
+        matches = data["phrases"][rows] == phrase
+        phrases[str(phrase)] = {"emails": int(matches.sum()), "accuracy": float(correct[matches].mean())}
+    return {"coverage": float(rows.mean()) if len(rows) else 0.0,
+            "accuracy": float(correct.mean()) if correct.size else 0.0, "phrases": phrases}
+
+def format_report(result):
+    """
+    Formats a threshold result as a per-class table and confusion matrix.
+    """
+    lines = [f"not_interested_threshold={result['not_interested_threshold']:.2f} "
+             f"interested_threshold={result['interested_threshold']:.2f} "
+             f"macro F1={result['macro_f1']:.3f} accuracy={result['accuracy']:.3f}",
+             f"{'class':<16}{'precision':>10}{'recall':>10}{'f1':>10}{'support':>10}"]
+    for name, row in result["classes"].items():
+        lines.append(f"{name:<16}{row['precision']:>10.3f}{row['recall']:>10.3f}{row['f1']:>10.3f}{row['support']:>10}")
+    lines.append(f"{'true/predicted':<16}" + ''.join(f"{name:>16}" for name in CLASSES))
+    for name, row in zip(CLASSES, result["confusion"]):
+        lines.append(f"{name:<16}" + ''.join(f"{count:>16}" for count in row))
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate and tune the sentiment thresholds offline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    score = commands.add_parser("score", help="Run inference once and store raw scores and heuristic verdicts")
+    score.add_argument("source", help="Labeled emails: poc_data files, a JSONL or .pack corpus, or any source with --labels")
+    score.add_argument("--labels", default=None, help="CSV (id,label) or JSONL file of true labels")
+    score.add_argument("--output", default="scores.npz", help="Where to store the scores")
+    score.add_argument("--batch-size", type=int, default=32, help="Emails per model forward pass")
+    score.add_argument("--backend", choices=sa.BACKENDS, default="pytorch", help="Model inference backend")
+    score.add_argument("--model-path", default=None, help="Local model directory")
+    score.add_argument("--no-cache", action="store_true", help="Do not read or write the score cache")
+    score.add_argument("--dedup-threshold", type=float, default=None,
+                       help="Score near-duplicates through their cluster representative at this similarity")
+    tune = commands.add_parser("sweep", help="Sweep the threshold grid over stored scores")
+    tune.add_argument("scores", help="Scores file written by the score command")
+    tune.add_argument("--step", type=float, default=0.01, help="Threshold grid step")
+    tune.add_argument("--metric", choices=METRICS, default="macro_f1", help="Metric to maximize")
+    tune.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == "score":
+        listener = sa.configure_logging()
+        cache = None
+        try:
+            model = sa.load_model(args.backend, args.model_path)
+            if not args.no_cache:
+                cache = ScoreCache(sa.CACHE_PATH, sa.model_id(args.backend, args.model_path),
+                                   sa.INTERESTED_THRESHOLD, sa.NOT_INTERESTED_THRESHOLD)
+            labels = load_labels(args.labels) if args.labels else None
+            dedup = NearDuplicateIndex(args.dedup_threshold) if args.dedup_threshold is not None else None
+            data = collect_scores(iter_labeled(args.source, labels), model, args.batch_size, cache=cache, dedup=dedup)
+            save_scores(args.output, data)
+            print(f"Stored {len(data['ids'])} scored emails in {args.output}")
+        finally:
+            if cache is not None:
+                cache.close()
+            listener.stop()
+        return 0
+
+    data = load_scores(args.scores)
+    start = time.perf_counter()
+    best = sweep(data, args.step, args.metric)
+    seconds = time.perf_counter() - start
+    current = evaluate_thresholds(data)
+    heuristics = heuristic_report(data)
+    if args.json:
+        print(json.dumps({"best": best, "current": current, "heuristics": heuristics}, indent=2))
+        return 0
+    print(f"{len(data['ids'])} emails, {best['pairs']} threshold pairs swept in {1000 * seconds:.1f}ms")
+    print(f"Heuristics decided {heuristics['coverage']:.1%} of emails with {heuristics['accuracy']:.1%} accuracy")
+    print(f"\nCurrent thresholds:\n{format_report(current)}")
+    print(f"\nBest by {args.metric}:\n{format_report(best)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
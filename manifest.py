@@ -0,0 +1,125 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+
+class Manifest:
+    """
+    Records which emails have been processed so incremental runs only score new or changed ones.
+    Each entry holds the email id (the file path for file sources), size, mtime, a content hash
+    and the result. Files whose size and mtime match are skipped without being read; other emails
+    are skipped when their content hash matches. Results are committed every checkpoint_every
+    emails, so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, path, checkpoint_every=500):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self.skipped = 0
+        self.recorded = 0
+        self.uncommitted = 0
+        # Sources such as JSONL or mbox exports may repeat an id, so each id queues its pending entries
+        self.in_flight = defaultdict(deque)
+        # Pipelined runs filter in a reader thread and record in the main thread
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS emails "
+                                "(id TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT, "
+                                "label TEXT, score REAL, method TEXT, processed_at REAL)")
+        self.connection.commit()
+
+    def is_unchanged(self, path, stat):
+        """
+        Returns True if path was processed before with the same size and mtime.
+        Used as the skip callback of email_sources so unchanged files are never read.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT size, mtime_ns FROM emails WHERE id = ?", (path,)).fetchone()
+            if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+                self.skipped += 1
+                return True
+        return False
+
+    def filter(self, records, files=False):
+        """
+        Yields only the (email_id, content) records whose content changed since they were last processed.
+        Records with an unchanged hash are skipped. With files set, ids are file paths and their new
+        size and mtime are stored; ids from JSONL, mbox or packed sources are never looked up on disk.
+        """
+        for email_id, content in records:
+            digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+            size = mtime_ns = None
+            if files:
+                try:
+                    stat = os.stat(email_id)
+                    size, mtime_ns = stat.st_size, stat.st_mtime_ns
+                except (OSError, ValueError):
+                    pass
+            with self.lock:
+                row = self.connection.execute("SELECT sha256 FROM emails WHERE id = ?", (email_id,)).fetchone()
+                unchanged = row is not None and row[0] == digest
+                if unchanged:
+                    self.connection.execute("UPDATE emails SET size = ?, mtime_ns = ? WHERE id = ?",
+                                            (size, mtime_ns, email_id))
+                    self.skipped += 1
+                    self._count_change()
+                else:
+                    self.in_flight[email_id].append((size, mtime_ns, digest))
+            if not unchanged:
+                yield email_id, content
+
+    def record(self, result):
+        """
+        Stores the result for an email that passed through filter.
+        """
+        with self.lock:
+            pending = self.in_flight[result["id"]]
+            size, mtime_ns, digest = pending.popleft()
+            if not pending:
+                del self.in_flight[result["id"]]
+            self.connection.execute(
+                "INSERT OR REPLACE INTO emails (id, size, mtime_ns, sha256, label, score, method, processed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (result["id"], size, mtime_ns, digest, result["label"], result["score"], result["method"],
+                 time.time()))
+            self.recorded += 1
+            self._count_change()
+
+    def _count_change(self):
+        self.uncommitted += 1
+        if self.uncommitted >= self.checkpoint_every:
+            self._commit()
+
+    def _commit(self):
+        self.connection.commit()
+        if self.uncommitted:
+            logging.info(f"Manifest checkpoint: {self.recorded} recorded, {self.skipped} unchanged")
+        self.uncommitted = 0
+
+    def checkpoint(self):
+        """
+        Commits recorded results so they survive a crash or interruption.
+        """
+        with self.lock:
+            self._commit()
+
+    def stats(self):
+        return {"recorded": self.recorded, "skipped": self.skipped}
+
+    def close(self):
+        self.checkpoint()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
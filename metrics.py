@@ -0,0 +1,184 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+class Metrics:
+    """
+    In-process counters for the scoring hot path: per-stage timers, model calls and batch sizes,
+    heuristic hits per phrase, cache hits and the label distribution.
+    Updates are a few dict operations under a lock, cheap enough to record for every email.
+    Snapshots from worker processes can be merged into the parent's registry.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.timers = {}
+            self.counters = Counter()
+            self.labels = Counter()
+            self.methods = Counter()
+            self.phrase_hits = Counter()
+            self.batch_sizes = Counter()
+
+    def observe(self, stage, seconds, items=1):
+        """
+        Adds seconds spent by stage on items emails.
+        """
+        with self.lock:
+            timer = self.timers.get(stage)
+            if timer is None:
+                self.timers[stage] = [1, items, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += items
+                timer[2] += seconds
+                if seconds > timer[3]:
+                    timer[3] = seconds
+
+    @contextmanager
+    def timer(self, stage, items=1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, items)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def record_batch(self, size):
+        """
+        Records one model call on a batch of size emails.
+        """
+        with self.lock:
+            self.counters["model_calls"] += 1
+            self.counters["model_emails"] += size
+            self.batch_sizes[size] += 1
+
+    def record_result(self, result):
+        """
+        Records the outcome of one scored email.
+        """
+        with self.lock:
+            self.labels[result["label"]] += 1
+            self.methods[result["method"]] += 1
+            if result.get("phrase"):
+                self.phrase_hits[result["phrase"]] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {"timers": {stage: list(timer) for stage, timer in self.timers.items()},
+                    "counters": dict(self.counters), "labels": dict(self.labels), "methods": dict(self.methods),
+                    "phrase_hits": dict(self.phrase_hits), "batch_sizes": dict(self.batch_sizes)}
+
+    def merge(self, snapshot):
+        """
+        Adds a snapshot taken in another process (such as a parallel worker) to these metrics.
+        """
+        with self.lock:
+            for stage, (calls, items, seconds, longest) in snapshot["timers"].items():
+                timer = self.timers.setdefault(stage, [0, 0, 0.0, 0.0])
+                timer[0] += calls
+                timer[1] += items
+                timer[2] += seconds
+                timer[3] = max(timer[3], longest)
+            self.counters.update(snapshot["counters"])
+            self.labels.update(snapshot["labels"])
+            self.methods.update(snapshot["methods"])
+            self.phrase_hits.update(snapshot["phrase_hits"])
+            self.batch_sizes.update(snapshot["batch_sizes"])
+
+    def summary(self):
+        """
+        Returns the metrics as a plain dict with derived rates.
+        """
+        data = self.snapshot()
+        total = sum(data["methods"].values())
+        heuristic = data["methods"].get("heuristic", 0)
+        calls = data["counters"].get("model_calls", 0)
+        data["emails"] = total
+        data["heuristic_hit_rate"] = heuristic / total if total else 0.0
+        data["mean_batch_size"] = data["counters"].get("model_emails", 0) / calls if calls else 0.0
+        cascade = data["counters"].get("cascade_accepted", 0) + data["counters"].get("cascade_escalated", 0)
+        data["cascade_escalation_rate"] = data["counters"].get("cascade_escalated", 0) / cascade if cascade else 0.0
+        data["elapsed_seconds"] = time.time() - self.started
+        return data
+
+    def render_summary(self):
+        """
+        Formats the metrics as a human-readable report.
+        """
+        data = self.summary()
+        lines = [f"Emails: {data['emails']} in {data['elapsed_seconds']:.1f}s",
+                 f"Heuristic hit rate: {data['heuristic_hit_rate']:.1%}",
+                 f"Model calls: {data['counters'].get('model_calls', 0)}, "
+                 f"mean batch size: {data['mean_batch_size']:.1f}"]
+        if "cascade_escalated" in data["counters"]:
+            lines.append(f"Cascade escalation rate: {data['cascade_escalation_rate']:.1%}")
+        lines.append("Stages:")
+        for stage, (calls, items, seconds, longest) in sorted(data["timers"].items()):
+            rate = items / seconds if seconds else 0.0
+            lines.append(f"  {stage:<12} {items:>10} items {seconds:>9.3f}s {rate:>12.1f}/s  max {1000 * longest:.2f}ms")
+        for title, counter in (("Labels", data["labels"]), ("Methods", data["methods"]),
+                               ("Heuristic phrases", data["phrase_hits"])):
+            if counter:
+                lines.append(f"{title}:")
+                lines.extend(f"  {name}: {value}" for name, value in sorted(counter.items(), key=lambda i: -i[1]))
+        return "\n".join(lines)
+
+    def render_prometheus(self, prefix="email_sentiment"):
+        """
+        Formats the metrics in the Prometheus text exposition format.
+        """
+        data = self.snapshot()
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for sample in samples:
+                suffix, labels, value = sample if len(sample) == 3 else ("",) + sample
+                label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+                sample_name = f"{prefix}_{name}{suffix}"
+                lines.append(f"{sample_name}{{{label_text}}} {value}" if label_text else f"{sample_name} {value}")
+
+        family("stage_seconds_total", "counter", "Time spent per pipeline stage.",
+               [({"stage": stage}, timer[2]) for stage, timer in sorted(data["timers"].items())])
+        family("stage_items_total", "counter", "Emails handled per pipeline stage.",
+               [({"stage": stage}, timer[1]) for stage, timer in sorted(data["timers"].items())])
+        family("emails_by_method_total", "counter", "Scored emails by method.",
+               [({"method": method}, value) for method, value in sorted(data["methods"].items())])
+        family("emails_by_label_total", "counter", "Scored emails by label.",
+               [({"label": str(label)}, value) for label, value in sorted(data["labels"].items(), key=str)])
+        family("heuristic_phrase_hits_total", "counter", "Heuristic matches per phrase.",
+               [({"phrase": phrase}, value) for phrase, value in sorted(data["phrase_hits"].items())])
+        family("model_calls_total", "counter", "Model forward calls.",
+               [({}, data["counters"].get("model_calls", 0))])
+        family("model_batch_size", "histogram", "Emails per model call.", _histogram(data["batch_sizes"]))
+        family("cascade_decisions_total", "counter", "Cascade classifier decisions by outcome.",
+               [({"outcome": "accepted"}, data["counters"].get("cascade_accepted", 0)),
+                ({"outcome": "escalated"}, data["counters"].get("cascade_escalated", 0))])
+        family("cache_lookups_total", "counter", "Score cache lookups by outcome.",
+               [({"outcome": "hit"}, data["counters"].get("cache_hits", 0)),
+                ({"outcome": "miss"}, data["counters"].get("cache_misses", 0))])
+        return "\n".join(lines) + "\n"
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _histogram(counts, buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)):
+    samples = [("_bucket", {"le": str(bucket)}, sum(value for size, value in counts.items() if size <= bucket))
+               for bucket in buckets]
+    samples.append(("_bucket", {"le": "+Inf"}, sum(counts.values())))
+    samples.append(("_sum", {}, sum(size * value for size, value in counts.items())))
+    samples.append(("_count", {}, sum(counts.values())))
+    return samples
+
+# Default registry used by sentiment and the service
+metrics = Metrics()
@@ -1,5 +1,10 @@
+import argparse
+import json
+import math
 import os
 import random
+from concurrent.futures import ProcessPoolExecutor
+from email_sources import PACK_LABELS, PACK_MAGIC, PACK_RECORD
 
 test_directory = "test_emails"
 email_categories = {
@@ -8,107 +13,215 @@ email_categories = {
     "not interested": 10
 }
 
-def generate_email_content(category):
-    greetings = ["Dear Team,", "Hello,", "Hi there,", "Greetings,"]
-    sign_offs = ["Best regards,", "Sincerely,", "Cheers,", "Kind regards,"]
-
-    body_interested = [
-        # Expanded interested cases
-        "I've gone through your proposal and I must say, it's exactly what we've been looking for. Let's schedule a call.",
-        "The solutions you're offering seem like a perfect match for our current challenges. Can we have a detailed discussion?",
-        "I am really enthusiastic about the possibilities of working together. What are the next steps from here?",
-        "Your insights into our sector were spot on. We are keen to explore how we can work together.",
-        "Your vision aligns closely with our business objectives. It would be great to understand more about your pricing structure.",
-        "The innovation you bring to the table is impressive. Can you send over a formal proposal so we can move this forward?",
-        "We're currently looking for exactly these kinds of services. Could you provide case studies or examples of similar work?",
-        "Your presentation sparked a lot of discussions here. We're interested in a trial to see how it goes.",
-        "Can you tailor your services to our needs? If so, we see a lot of potential for a partnership.",
-        "We were discussing finding a solution like yours just recently. Let's set up a demo session.",
-        "Your proposal caught my attention. I'd like to hear more.",
-        "I'm positively inclined towards your offer. Please provide further details.",
-        "Your idea resonates with our goals. Can we discuss this soon?",
-        "I see great potential in this partnership. Let's explore further.",
-        "Your approach is exactly what we've been looking for. Excited to talk more!",
-        "I found your proposal intriguing and would love to learn more.",
-        "Your product seems to fit our needs. Can we discuss this in detail?",
-        "I'm very interested in your services. Please send more information.",
-        "This sounds great! Let's set up a meeting to discuss further.",
-        "I'm impressed by what I've seen. What are the next steps?"
-    ]
-
-
-    body_neutral = [
-        # Expanded neutral cases
-        "We've received your proposal and are currently in the process of evaluation. We'll reach out if it aligns with our plans.",
-        "Your offer seems interesting, but it's not a priority for us right now. We'll keep it in mind for future needs.",
-        "I'm in the middle of something and can't look into this right now. Can you follow up in a month?",
-        "We're not in the market for new solutions currently, but I'd like to revisit this conversation in a few quarters.",
-        "It's an interesting proposition, but without more concrete ROI figures, I can't take this to my team.",
-        "Can you provide a demo or a trial period? We would like to assess the practicality before making any decisions.",
-        "This could potentially be of interest. Let's touch base in the next fiscal when we have more budget flexibility.",
-        "I'm forwarding your information to the relevant department. They will get back to you if there's an interest.",
-        "We have a few projects closing soon. Let's reconnect once we have more bandwidth.",
-        "I see where you're coming from, but I'm not sure how this fits into our current strategy. Let me give it some thought.",
-        "Your proposal is interesting. I will get back to you after some deliberation.",
-        "I am somewhat intrigued by your offer, but I need more time to decide.",
-        "I've received your information and will review it soon.",
-        "Your email is noted. We are currently exploring a few options.",
-        "This might be something we're interested in. I'll confirm in a few days.",
-        "Thank you for your email. I'll review and get back to you.",
-        "Can you provide more details? I need to consider this further.",
-        "I received your email, and I will think about it and respond soon.",
-        "This is interesting, but I need some time to look into it.",
-        "I'll need to discuss this with my team before making a decision."
-    ]
-
-
-    body_not_interested = [
-        # Additional expanded not interested cases
-        "We've given it some thought and have to decline your offer at this time.",
-        "It's not quite what we're looking for right now, but thank you for considering us.",
-        "Our priorities have shifted, and unfortunately, this doesn't fit in our current agenda.",
-        "We did a detailed review and it's not a match for our current strategy. Best of luck!",
-        "Thank you for your detailed proposal, but we will not be moving forward with it.",
-        "We appreciate your interest in working with us, but it's not a good fit at this stage.",
-        "Our needs in this area are already met by a current provider, so we'll pass for now.",
-        "This isn't something we are prepared to invest in at this point in time.",
-        "We're consolidating our existing tools and services, so we can't accommodate your offer.",
-        "Your proposal was clear and well-presented, but it's not what we need at the moment.",
-        "While your offering is impressive, it's not aligned with our current focus areas.",
-        "While we appreciate the effort you've put into this, it doesn't align with our current strategy.",
-        "We are overhauling our systems, and unfortunately, what you're offering doesn't fit into our new model.",
-        "Our focus areas have shifted, and at this point, we are not looking to invest in such solutions.",
-        "Thank you for reaching out, but we are currently under contractual obligations with a similar provider.",
-        "We've reviewed your materials and decided that it isn't the right time for us to embark on this kind of initiative.",
-        "Our budget has been earmarked for other projects this year, so we won't be able to consider your proposal.",
-        "We're going in a different direction and this doesn't fit into our long-term plans.",
-        "We've recently committed to a competitor's product that serves a similar purpose.",
-        "Our team doesn't have the capacity to take on new projects at the moment.",
-        "After reviewing, we have concluded that your product doesn't meet our specific needs right now.",
-        "Thank you for the information, but we're not interested at the moment.",
-        "This doesn't align with our current needs, but I'll keep your details.",
-        "Unfortunately, we have to pass on this opportunity.",
-        "We are not looking to purchase or invest in new solutions right now.",
-        "I don't think this is what we need at the moment."
-    ]
+GREETINGS = ["Dear Team,", "Hello,", "Hi there,", "Greetings,"]
+SIGN_OFFS = ["Best regards,", "Sincerely,", "Cheers,", "Kind regards,"]
 
+BODY_INTERESTED = [
+    # Expanded interested cases
+    "I've gone through your proposal and I must say, it's exactly what we've been looking for. Let's schedule a call.",
+    "The solutions you're offering seem like a perfect match for our current challenges. Can we have a detailed discussion?",
+    "I am really enthusiastic about the possibilities of working together. What are the next steps from here?",
+    "Your insights into our sector were spot on. We are keen to explore how we can work together.",
+    "Your vision aligns closely with our business objectives. It would be great to understand more about your pricing structure.",
+    "The innovation you bring to the table is impressive. Can you send over a formal proposal so we can move this forward?",
+    "We're currently looking for exactly these kinds of services. Could you provide case studies or examples of similar work?",
+    "Your presentation sparked a lot of discussions here. We're interested in a trial to see how it goes.",
+    "Can you tailor your services to our needs? If so, we see a lot of potential for a partnership.",
+    "We were discussing finding a solution like yours just recently. Let's set up a demo session.",
+    "Your proposal caught my attention. I'd like to hear more.",
+    "I'm positively inclined towards your offer. Please provide further details.",
+    "Your idea resonates with our goals. Can we discuss this soon?",
+    "I see great potential in this partnership. Let's explore further.",
+    "Your approach is exactly what we've been looking for. Excited to talk more!",
+    "I found your proposal intriguing and would love to learn more.",
+    "Your product seems to fit our needs. Can we discuss this in detail?",
+    "I'm very interested in your services. Please send more information.",
+    "This sounds great! Let's set up a meeting to discuss further.",
+    "I'm impressed by what I've seen. What are the next steps?"
+]
 
+
+BODY_NEUTRAL = [
+    # Expanded neutral cases
+    "We've received your proposal and are currently in the process of evaluation. We'll reach out if it aligns with our plans.",
+    "Your offer seems interesting, but it's not a priority for us right now. We'll keep it in mind for future needs.",
+    "I'm in the middle of something and can't look into this right now. Can you follow up in a month?",
+    "We're not in the market for new solutions currently, but I'd like to revisit this conversation in a few quarters.",
+    "It's an interesting proposition, but without more concrete ROI figures, I can't take this to my team.",
+    "Can you provide a demo or a trial period? We would like to assess the practicality before making any decisions.",
+    "This could potentially be of interest. Let's touch base in the next fiscal when we have more budget flexibility.",
+    "I'm forwarding your information to the relevant department. They will get back to you if there's an interest.",
+    "We have a few projects closing soon. Let's reconnect once we have more bandwidth.",
+    "I see where you're coming from, but I'm not sure how this fits into our current strategy. Let me give it some thought.",
+    "Your proposal is interesting. I will get back to you after some deliberation.",
+    "I am somewhat intrigued by your offer, but I need more time to decide.",
+    "I've received your information and will review it soon.",
+    "Your email is noted. We are currently exploring a few options.",
+    "This might be something we're interested in. I'll confirm in a few days.",
+    "Thank you for your email. I'll review and get back to you.",
+    "Can you provide more details? I need to consider this further.",
+    "I received your email, and I will think about it and respond soon.",
+    "This is interesting, but I need some time to look into it.",
+    "I'll need to discuss this with my team before making a decision."
+]
+
+
+BODY_NOT_INTERESTED = [
+    # Additional expanded not interested cases
+    "We've given it some thought and have to decline your offer at this time.",
+    "It's not quite what we're looking for right now, but thank you for considering us.",
+    "Our priorities have shifted, and unfortunately, this doesn't fit in our current agenda.",
+    "We did a detailed review and it's not a match for our current strategy. Best of luck!",
+    "Thank you for your detailed proposal, but we will not be moving forward with it.",
+    "We appreciate your interest in working with us, but it's not a good fit at this stage.",
+    "Our needs in this area are already met by a current provider, so we'll pass for now.",
+    "This isn't something we are prepared to invest in at this point in time.",
+    "We're consolidating our existing tools and services, so we can't accommodate your offer.",
+    "Your proposal was clear and well-presented, but it's not what we need at the moment.",
+    "While your offering is impressive, it's not aligned with our current focus areas.",
+    "While we appreciate the effort you've put into this, it doesn't align with our current strategy.",
+    "We are overhauling our systems, and unfortunately, what you're offering doesn't fit into our new model.",
+    "Our focus areas have shifted, and at this point, we are not looking to invest in such solutions.",
+    "Thank you for reaching out, but we are currently under contractual obligations with a similar provider.",
+    "We've reviewed your materials and decided that it isn't the right time for us to embark on this kind of initiative.",
+    "Our budget has been earmarked for other projects this year, so we won't be able to consider your proposal.",
+    "We're going in a different direction and this doesn't fit into our long-term plans.",
+    "We've recently committed to a competitor's product that serves a similar purpose.",
+    "Our team doesn't have the capacity to take on new projects at the moment.",
+    "After reviewing, we have concluded that your product doesn't meet our specific needs right now.",
+    "Thank you for the information, but we're not interested at the moment.",
+    "This doesn't align with our current needs, but I'll keep your details.",
+    "Unfortunately, we have to pass on this opportunity.",
+    "We are not looking to purchase or invest in new solutions right now.",
+    "I don't think this is what we need at the moment."
+]
+
+CATEGORY_BODIES = {
+    "interested": BODY_INTERESTED,
+    "neutral": BODY_NEUTRAL,
+    "not interested": BODY_NOT_INTERESTED,
+}
+
+# Extra material for realistic corpora: names, companies, links, and the outbound pitch being replied to
+FIRST_NAMES = ["Alex", "Jordan", "Sam", "Taylor", "Morgan", "Casey", "Jamie", "Riley", "Avery", "Quinn"]
+LAST_NAMES = ["Smith", "Garcia", "Chen", "Patel", "Kowalski", "Okafor", "Novak", "Silva", "Berg", "Tanaka"]
+TITLES = ["Head of Procurement", "VP Operations", "IT Director", "CFO", "Purchasing Manager", "CTO"]
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Group", "Stark Logistics", "Wayne Analytics"]
+URL_SENTENCES = [
+    "You can find our current setup described at https://www.{domain}/about.",
+    "For reference, our vendor policy is here: https://{domain}/vendors/policy.pdf",
+    "Our last RFP is posted at http://procurement.{domain}/rfp?id={number}.",
+]
+PITCHES = [
+    "I wanted to reach out about how our platform can cut your reporting time in half.",
+    "Following up on my note last week about our logistics optimization service.",
+    "We help teams like yours automate vendor onboarding. Would a short call make sense?",
+]
+
+def file_label(category):
+    """
+    Returns the category as used in file names, with spaces replaced so names are shell-safe.
+    """
+    return category.replace(' ', '_')
+
+def generate_email_content(category, rng=random):
     email_body = ""
     if category == "interested":
-        email_body = random.choice(body_interested)
+        email_body = rng.choice(BODY_INTERESTED)
     elif category == "neutral":
-        email_body = random.choice(body_neutral)
+        email_body = rng.choice(BODY_NEUTRAL)
     else:  # not interested
-        email_body = random.choice(body_not_interested)
+        email_body = rng.choice(BODY_NOT_INTERESTED)
+
+    return f"{rng.choice(GREETINGS)}\n\n{email_body}\n\n{rng.choice(SIGN_OFFS)}"
 
-    return f"{random.choice(greetings)}\n\n{email_body}\n\n{random.choice(sign_offs)}"
+def generate_realistic_email(category, rng=random, mean_sentences=1.5, length_sigma=0.6,
+                             url_rate=0.1, signature_rate=0.3, quoted_rate=0.3):
+    """
+    Generates a reply with a log-normally distributed number of body sentences drawn from the
+    category, averaging mean_sentences with length_sigma as the spread of its logarithm, and optionally mixes in a URL sentence, a full
+    signature block and the quoted outbound pitch, with the given probabilities.
+    """
+    bodies = CATEGORY_BODIES[category]
+    # lognormvariate(mu, sigma) has median e**mu and mean e**(mu + sigma**2 / 2)
+    mu = math.log(mean_sentences) - length_sigma ** 2 / 2
+    sentences = max(1, min(len(bodies), round(rng.lognormvariate(mu, length_sigma))))
+    paragraphs = rng.sample(bodies, sentences)
+    company = rng.choice(COMPANIES)
+    domain = company.lower().replace(' ', '') + ".com"
+    if rng.random() < url_rate:
+        paragraphs.insert(rng.randint(0, len(paragraphs)),
+                          rng.choice(URL_SENTENCES).format(domain=domain, number=rng.randint(100, 9999)))
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    email = f"{rng.choice(GREETINGS)}\n\n" + "\n\n".join(paragraphs) + f"\n\n{rng.choice(SIGN_OFFS)}\n{name}"
+    if rng.random() < signature_rate:
+        email += (f"\n--\n{name}\n{rng.choice(TITLES)}, {company}\n+1 555 {rng.randint(100, 999)} "
+                  f"{rng.randint(1000, 9999)}\n{name.split()[0].lower()}@{domain}")
+    if rng.random() < quoted_rate:
+        sender = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        email += (f"\n\nOn Mon, {rng.randint(1, 28)} Jan 2024, {sender} <sales@vendor.example> wrote:\n"
+                  f"> Hi {name.split()[0]},\n> {rng.choice(PITCHES)}\n> Best,\n> {sender}")
+    return email
+
+def _generate_shard(output, shard, start, count, seed, fmt, weights, options):
+    """
+    Writes emails start..start+count-1 of a corpus. Every shard seeds its own generator from
+    (seed, shard), so the corpus is identical whatever the number of workers.
+    """
+    rng = random.Random(f"{seed}:{shard}")
+    categories = list(weights)
+    labels = rng.choices(categories, weights=list(weights.values()), k=count)
+    if fmt == "files":
+        for offset, category in enumerate(labels):
+            path = os.path.join(output, f"{file_label(category)}_{start + offset + 1}.txt")
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(generate_realistic_email(category, rng, **options))
+        return count
+    path = os.path.join(output, f"corpus-{shard:05d}.{'jsonl' if fmt == 'jsonl' else 'pack'}")
+    if fmt == "jsonl":
+        with open(path, 'w', encoding='utf-8') as file:
+            for offset, category in enumerate(labels):
+                record = {"id": f"{file_label(category)}_{start + offset + 1}", "label": category,
+                          "body": generate_realistic_email(category, rng, **options)}
+                file.write(json.dumps(record) + "\n")
+    else:
+        with open(path, 'wb') as file:
+            file.write(PACK_MAGIC)
+            for offset, category in enumerate(labels):
+                email_id = f"{file_label(category)}_{start + offset + 1}".encode('utf-8')
+                body = generate_realistic_email(category, rng, **options).encode('utf-8')
+                file.write(PACK_RECORD.pack(len(email_id), PACK_LABELS.index(category), len(body)))
+                file.write(email_id)
+                file.write(body)
+    return count
 
-def handle_existing_directory():
-    choice = input("Testing directory is populated. Choose an option:\n"
-                   "1) Keep current testing emails\n"
-                   "2) Keep current emails and add more emails for testing\n"
-                   "3) Remove current testing emails and replace them\n"
-                   "Enter choice (1, 2, 3): ")
+def generate_corpus(output, count, seed=0, workers=1, fmt="jsonl", shard_size=100000, weights=None, **options):
+    """
+    Generates a labeled synthetic corpus of count emails without any prompts.
+    fmt is "files" (one shell-safe <label>_<n>.txt per email), "jsonl" (corpus-NNNNN.jsonl shards of
+    {"id", "label", "body"}) or "pack" (corpus-NNNNN.pack shards readable by email_sources.iter_packed).
+    Shards of shard_size emails are generated across workers processes; output is deterministic for a
+    given seed. weights maps categories to their share of the corpus (equal by default) and options are
+    passed to generate_realistic_email.
+    """
+    if fmt not in ("files", "jsonl", "pack"):
+        raise ValueError(f"Unknown corpus format {fmt!r}")
+    weights = weights or {category: 1 for category in CATEGORY_BODIES}
+    os.makedirs(output, exist_ok=True)
+    shards = [(output, shard, start, min(shard_size, count - start), seed, fmt, weights, options)
+              for shard, start in enumerate(range(0, count, shard_size))]
+    if workers <= 1:
+        return sum(_generate_shard(*shard) for shard in shards)
+    with ProcessPoolExecutor(workers) as executor:
+        return sum(executor.map(_generate_shard, *zip(*shards)))
+
+def handle_existing_directory(choice=None):
+    if choice is None:
+        choice = input("Testing directory is populated. Choose an option:\n"
+                       "1) Keep current testing emails\n"
+                       "2) Keep current emails and add more emails for testing\n"
+                       "3) Remove current testing emails and replace them\n"
+                       "Enter choice (1, 2, 3): ")
 
     if choice == "1":
         return  # Keep current emails
@@ -117,7 +230,7 @@ def handle_existing_directory():
         existing_counts = {cat: 0 for cat in email_categories}
         for filename in os.listdir(test_directory):
             for cat in email_categories:
-                if filename.startswith(cat):
+                if filename.startswith(f"{file_label(cat)}_"):
                     existing_counts[cat] += 1
         for cat in email_categories:
             email_categories[cat] = max(0, email_categories[cat] - existing_counts[cat])
@@ -126,15 +239,15 @@ def handle_existing_directory():
         for filename in os.listdir(test_directory):
             os.remove(os.path.join(test_directory, filename))
 
-def create_test_emails():
+def create_test_emails(choice=None):
     if os.path.exists(test_directory):
-        handle_existing_directory()
+        handle_existing_directory(choice)
     else:
         os.makedirs(test_directory)
 
     for category, count in email_categories.items():
         for i in range(count):
-            filename = f"{test_directory}/{category}_{i+1}.txt"
+            filename = f"{test_directory}/{file_label(category)}_{i+1}.txt"
             try:
                 content = generate_email_content(category)
                 with open(filename, 'w') as file:
@@ -143,5 +256,32 @@ def create_test_emails():
             except Exception as e:
                 print(f"Error generating file {filename}: {e}")
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate labeled test emails.")
+    parser.add_argument("--choice", choices=["1", "2", "3"], default=None,
+                        help="Answer for a populated test directory instead of prompting")
+    parser.add_argument("--count", type=int, default=None,
+                        help="Generate a synthetic corpus of this many emails instead of the small test set")
+    parser.add_argument("--output", default="corpus", help="Corpus output directory")
+    parser.add_argument("--format", choices=["files", "jsonl", "pack"], default="jsonl", help="Corpus format")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for deterministic output")
+    parser.add_argument("--workers", type=int, default=1, help="Processes generating shards in parallel")
+    parser.add_argument("--shard-size", type=int, default=100000, help="Emails per shard")
+    parser.add_argument("--mean-sentences", type=float, default=1.5, help="Mean body sentences per email (of the log-normal draw, before clamping)")
+    parser.add_argument("--length-sigma", type=float, default=0.6, help="Standard deviation of the log of the body length")
+    parser.add_argument("--url-rate", type=float, default=0.1, help="Share of emails with a URL")
+    parser.add_argument("--signature-rate", type=float, default=0.3, help="Share of emails with a signature block")
+    parser.add_argument("--quoted-rate", type=float, default=0.3, help="Share of emails with a quoted reply")
+    args = parser.parse_args(argv)
+
+    if args.count is None:
+        create_test_emails(args.choice)
+        return
+    generated = generate_corpus(args.output, args.count, args.seed, args.workers, args.format, args.shard_size,
+                                mean_sentences=args.mean_sentences, length_sigma=args.length_sigma,
+                                url_rate=args.url_rate, signature_rate=args.signature_rate,
+                                quoted_rate=args.quoted_rate)
+    print(f"Generated {generated} emails in {args.output}")
+
 if __name__ == "__main__":
-    create_test_emails()
+    main()
@@ -0,0 +1,136 @@
+import hashlib
+import logging
+import os
+import sqlite3
+
+class ScoreCache:
+    """
+    Persistent, content-addressed cache of model results backed by SQLite.
+    Entries are keyed by a hash of the normalized text plus the model name and thresholds.
+    When the model or thresholds change, the stored entries are dropped on open.
+    The cache holds at most max_entries rows; the least recently used rows are evicted first.
+    """
+
+    def __init__(self, path, model_name, interested_threshold, not_interested_threshold, max_entries=1000000):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.max_entries = max_entries
+        # Scores are stored as the probability of POSITIVE; the suffix drops caches of top-class confidences
+        self.fingerprint = f"{model_name}|{interested_threshold}|{not_interested_threshold}|p_positive"
+        self.hits = 0
+        self.misses = 0
+        # Pipelined runs use the cache from the inference stage thread
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        # Parallel workers open the same file, so the schema is set up under the write lock
+        self.connection.execute("BEGIN IMMEDIATE")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS scores "
+                                "(key TEXT PRIMARY KEY, label TEXT, score REAL, last_used INTEGER)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)")
+        # Row count kept by triggers, shared by every connection without a COUNT(*) scan per write
+        self.connection.execute("CREATE TABLE IF NOT EXISTS size (entries INTEGER)")
+        if self.connection.execute("SELECT COUNT(*) FROM size").fetchone()[0] == 0:
+            self.connection.execute("INSERT INTO size SELECT COUNT(*) FROM scores")
+        self.connection.execute("CREATE TRIGGER IF NOT EXISTS scores_added AFTER INSERT ON scores "
+                                "BEGIN UPDATE size SET entries = entries + 1; END")
+        self.connection.execute("CREATE TRIGGER IF NOT EXISTS scores_removed AFTER DELETE ON scores "
+                                "BEGIN UPDATE size SET entries = entries - 1; END")
+        row = self.connection.execute("SELECT value FROM meta WHERE name = 'fingerprint'").fetchone()
+        if row is None or row[0] != self.fingerprint:
+            if row is not None:
+                logging.info(f"Score cache {path} invalidated: {row[0]} -> {self.fingerprint}")
+            self.connection.execute("DELETE FROM scores")
+            self.connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('fingerprint', ?)",
+                                    (self.fingerprint,))
+        self.connection.commit()
+        self.size = self.connection.execute("SELECT entries FROM size").fetchone()[0]
+        self.clock = self.connection.execute("SELECT COALESCE(MAX(last_used), 0) FROM scores").fetchone()[0]
+
+    def key(self, text):
+        """
+        Returns the cache key for a normalized text.
+        """
+        return hashlib.sha256(f"{self.fingerprint}\0{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, texts):
+        """
+        Looks up normalized texts and returns {text: (label, score)} for the cached ones.
+        """
+        keys = {self.key(text): text for text in texts}
+        found = {}
+        key_list = list(keys)
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(key_list), 500):
+            chunk = key_list[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT key, label, score FROM scores WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            for key, label, score in rows:
+                found[keys[key]] = (label, score)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        if found:
+            self.clock += 1
+            self.connection.executemany("UPDATE scores SET last_used = ? WHERE key = ?",
+                                        [(self.clock, self.key(text)) for text in found])
+            self.connection.commit()
+        return found
+
+    def get(self, text):
+        """
+        Returns (label, score) for a normalized text, or None if it is not cached.
+        """
+        return self.get_many([text]).get(text)
+
+    def put_many(self, entries):
+        """
+        Stores (text, label, score) entries and evicts the least recently used rows beyond max_entries.
+        Raises sqlite3.OperationalError if another process holds the write lock past the timeout.
+        """
+        if not entries:
+            return
+        try:
+            # Parallel workers share the file, so the size and clock are re-read under the write lock
+            # to keep the max_entries bound and the LRU order across all of them
+            self.connection.execute("BEGIN IMMEDIATE")
+            clock = self.connection.execute("SELECT COALESCE(MAX(last_used), 0) FROM scores").fetchone()[0]
+            self.clock = max(self.clock, clock) + 1
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO scores (key, label, score, last_used) VALUES (?, ?, ?, ?)",
+                [(self.key(text), label, score, self.clock) for text, label, score in entries])
+            self.size = self.connection.execute("SELECT entries FROM size").fetchone()[0]
+            if self.size > self.max_entries:
+                self.connection.execute(
+                    "DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY last_used LIMIT ?)",
+                    (self.size - self.max_entries,))
+                self.size = self.max_entries
+            self.connection.commit()
+        except sqlite3.Error:
+            self.connection.rollback()
+            raise
+
+    def put(self, text, label, score):
+        """
+        Stores the result for a single normalized text.
+        """
+        self.put_many([(text, label, score)])
+
+    def stats(self):
+        """
+        Returns hit/miss counters and the current number of entries.
+        """
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "entries": self.size,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
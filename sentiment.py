@@ -1,8 +1,23 @@
 import os
-import glob
+import argparse
+import copy
 import logging
+import multiprocessing
+import queue
 import re
-from transformers import pipeline
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from logging.handlers import QueueHandler, QueueListener
+from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+from email_sources import iter_source, iter_source_files, read_message_file
+from manifest import Manifest
+from dedup import NearDuplicateIndex
+from metrics import metrics
+from score_cache import ScoreCache
 
 # ANSI escape codes for colors
 RED = "\033[91m"
@@ -10,111 +25,892 @@ GREEN = "\033[92m"
 BLUE = "\033[94m"
 RESET = "\033[0m"
 
-# Setup logging
-logging_directory = "logs"
-if not os.path.exists(logging_directory):
-    os.makedirs(logging_directory)
-logging.basicConfig(filename=f'{logging_directory}/analysis.log', level=logging.DEBUG, 
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+LOG_DIRECTORY = "logs"
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
 
-def load_model():
+# Background writer set up by configure_logging
+log_listener = None
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the QueueListener thread. The stock prepare() formats
+    every record, traceback included, in the thread that logs it; this one only copies the record.
+    """
+
+    def prepare(self, record):
+        return copy.copy(record)
+
+def configure_logging(level=logging.INFO, log_directory=LOG_DIRECTORY, queued=True):
+    """
+    Sends log records to log_directory/analysis.log at the given level.
+    With queued set, callers only copy records onto an in-memory queue (see DeferredQueueHandler)
+    and a QueueListener thread does the formatting and file writes, so logging never blocks scoring. Returns the listener;
+    call its stop() before exiting to flush the remaining records.
+    """
+    global log_listener
+    if not os.path.exists(log_directory):
+        os.makedirs(log_directory)
+    file_handler = logging.FileHandler(os.path.join(log_directory, "analysis.log"))
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger()
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(level)
+    if not queued:
+        root.addHandler(file_handler)
+        return None
+    log_queue = queue.SimpleQueue()
+    root.addHandler(DeferredQueueHandler(log_queue))
+    log_listener = QueueListener(log_queue, file_handler)
+    log_listener.start()
+    return log_listener
+
+MODEL_NAME = "distilbert-base-uncased-finetuned-sst-2-english"
+
+# Adjust these thresholds as needed
+INTERESTED_THRESHOLD = 0.7
+NOT_INTERESTED_THRESHOLD = 0.3
+
+CACHE_PATH = "cache/scores.sqlite"
+MANIFEST_PATH = "cache/manifest.sqlite"
+
+# Inference backends accepted by load_model
+BACKENDS = ("pytorch", "int8", "onnx")
+
+def model_id(backend="pytorch", model_path=None):
+    """
+    Identifies the loaded model for cache invalidation: backends can score slightly differently.
+    """
+    return f"{model_path or MODEL_NAME}:{backend}"
+
+def load_model(backend="pytorch", model_path=None):
     """
     Loads the sentiment analysis model.
     Uses the 'distilbert-base-uncased-finetuned-sst-2-english' model for sentiment analysis.
+    backend selects eager full-precision PyTorch ("pytorch"), dynamically int8-quantized PyTorch
+    ("int8"), or an ONNX Runtime session ("onnx", which needs the optional optimum[onnxruntime]
+    package and exports the model to ONNX unless model_path already holds a model.onnx).
+    With model_path, the model is loaded from that local directory without network access.
     """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    source = model_path or MODEL_NAME
+    local_files_only = model_path is not None
     try:
-        model = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
-        logging.info("Sentiment analysis model loaded successfully.")
+        tokenizer = AutoTokenizer.from_pretrained(source, local_files_only=local_files_only)
+        if backend == "onnx":
+            try:
+                from optimum.onnxruntime import ORTModelForSequenceClassification
+            except ImportError as e:
+                raise ImportError("The onnx backend requires optimum[onnxruntime]: "
+                                  "pip install optimum[onnxruntime]") from e
+            exported = model_path is not None and os.path.exists(os.path.join(model_path, "model.onnx"))
+            network = ORTModelForSequenceClassification.from_pretrained(
+                source, export=not exported, local_files_only=local_files_only)
+        else:
+            network = AutoModelForSequenceClassification.from_pretrained(source, local_files_only=local_files_only)
+            if backend == "int8":
+                import torch
+                network = torch.ao.quantization.quantize_dynamic(network, {torch.nn.Linear}, dtype=torch.qint8)
+        model = pipeline("sentiment-analysis", model=network, tokenizer=tokenizer)
+        logging.info(f"Sentiment analysis model loaded successfully ({backend} backend from {source}).")
         return model
     except Exception as e:
         logging.error(f"Error loading model: {e}", exc_info=True)
         raise
 
+# Normalization patterns, compiled once at import
+URL_PATTERN = re.compile(r'http\S+')
+EMAIL_ADDRESS_PATTERN = re.compile(r'\S*@\S*\s?')
+NON_ALPHANUMERIC_PATTERN = re.compile(r'[^A-Za-z0-9]+')
+COMMON_SIGNATURES = ["regards", "cheers", "sincerely", "thanks", "thank you"]
+SIGNATURE_PATTERN = re.compile('|'.join(map(re.escape, COMMON_SIGNATURES)), re.IGNORECASE)
+SIGNATURE_MAX_LENGTH = max(map(len, COMMON_SIGNATURES))
+# Start of quoted history in a reply: "> ..." lines, "On <date>, <name> wrote:" or an Outlook separator
+QUOTED_REPLY_PATTERN = re.compile(r'\s*>|On\s.*\swrote:\s*$|\s*-{2,}\s*Original Message\s*-{2,}', re.IGNORECASE)
+
+def _clean(text):
+    text = URL_PATTERN.sub('', text)
+    text = EMAIL_ADDRESS_PATTERN.sub('', text)
+    return NON_ALPHANUMERIC_PATTERN.sub(' ', text)
+
 def normalize_text(text):
     """
     Normalizes the text by removing or standardizing special characters, URLs, and email addresses.
     Also, removes common email signatures and disclaimers.
     """
-    text = re.sub(r'http\S+', '', text)
-    text = re.sub(r'\S*@\S*\s?', '', text)
-    text = re.sub(r'[^A-Za-z0-9]+', ' ', text)
-    common_signatures = ["regards", "cheers", "sincerely", "thanks", "thank you"]
-    for signature in common_signatures:
-        text = re.split(signature, text, flags=re.IGNORECASE)[0]
+    text = _clean(text)
+    signature = SIGNATURE_PATTERN.search(text)
+    if signature:
+        text = text[:signature.start()]
     return text.strip()
 
-def heuristic_check(content):
+def normalize_stream(lines, stop_at_quoted=True):
+    """
+    Normalizes an email body incrementally from an iterable of lines, such as an open file.
+    Stops reading at the first signature or, if stop_at_quoted is set, at the first quoted-reply
+    line, so the rest of a large message is never read. Without quoted history the result is
+    identical to normalize_text on the whole body.
+    """
+    pieces = []
+    tail = ''
+    for line in lines:
+        if stop_at_quoted and QUOTED_REPLY_PATTERN.match(line):
+            break
+        piece = _clean(line)
+        # A non-alphanumeric run that spans lines collapses to a single space
+        if piece.startswith(' ') and tail.endswith(' '):
+            piece = piece[1:]
+        # Signatures may span the previous line, so search the carried-over tail as well
+        window = tail + piece
+        signature = SIGNATURE_PATTERN.search(window)
+        if signature:
+            pieces.append(piece)
+            text = ''.join(pieces)
+            return text[:len(text) - len(window) + signature.start()].strip()
+        pieces.append(piece)
+        tail = window[-(SIGNATURE_MAX_LENGTH - 1):]
+    return ''.join(pieces).strip()
+
+def read_normalized(path, mime=False, stop_at_quoted=True):
+    """
+    Reads and normalizes one message file with normalize_stream. Plain-text files are read line by
+    line and closed at the first signature or quoted reply; MIME messages are parsed whole first.
+    """
+    if mime or path.endswith('.eml'):
+        return normalize_stream(read_message_file(path, mime=True).splitlines(keepends=True), stop_at_quoted)
+    with open(path, 'r', encoding='utf-8') as file:
+        return normalize_stream(file, stop_at_quoted)
+
+def iter_normalized(source, skip=None):
+    """
+    Yields (email_id, normalized text) from source. Message files are normalized while they are
+    read with read_normalized; emails from mbox, JSONL and packed sources go through normalize_stream.
+    """
+    files = iter_source_files(source, skip)
+    if files is None:
+        for email_id, body in iter_source(source, skip):
+            yield email_id, normalize_stream(body.splitlines(keepends=True))
+    else:
+        for path, mime in files:
+            yield path, read_normalized(path, mime)
+
+# Heuristic phrase sets, highest priority first
+NOT_INTERESTED_PHRASES = ["not interested", "unsubscribe", "stop emailing", "no thanks", "no"]
+INTERESTED_PHRASES = ["sounds great", "tell me more", "very interested", "let's meet", "interested"]
+NEUTRAL_PHRASES = [
+    "I'll think about it", "I'll review", "maybe later",
+    "currently reviewing", "will consider", "will look into it",
+    "need more time", "undecided", "not sure", "possibly"
+]
+HEURISTIC_PHRASES = [
+    ("not interested", NOT_INTERESTED_PHRASES),
+    ("interested", INTERESTED_PHRASES),
+    ("neutral", NEUTRAL_PHRASES),
+]
+
+def _phrase_key(phrase):
+    return ' '.join(re.findall(r'[a-z0-9]+', phrase.lower()))
+
+def _phrase_pattern(keys):
+    if not keys:
+        return None
+    # Longest first, so "no thanks" wins over "no" at the same position
+    alternatives = sorted(keys, key=len, reverse=True)
+    return re.compile(
+        r'\b(?:' + '|'.join(r'[^a-z0-9]+'.join(map(re.escape, key.split())) for key in alternatives) + r')\b',
+        re.IGNORECASE)
+
+class PhraseMatcher:
+    """
+    Matches heuristic phrases with compiled, case-insensitive, word-boundary regexes.
+    Punctuation inside a phrase matches any run of non-alphanumeric characters, so "I'll review"
+    also matches normalized text ("I ll review"). phrase_sets is a list of (label, phrases)
+    ordered by priority; when several phrases occur, the highest-priority label wins, even when
+    its phrase overlaps a lower-priority one ("am not" in "I am not interested").
+    One regex over all phrases rules out most emails in a single scan; when it finds a phrase,
+    the per-label regexes of the higher-priority labels are searched as well.
+    """
+
+    def __init__(self, phrase_sets=HEURISTIC_PHRASES):
+        self.phrases = {}
+        self.ranks = {}
+        for rank, (label, phrases) in enumerate(phrase_sets):
+            self.ranks[label] = rank
+            for phrase in phrases:
+                self.phrases.setdefault(_phrase_key(phrase), (label, phrase))
+        self.pattern = _phrase_pattern(self.phrases)
+        self.label_patterns = [_phrase_pattern([key for key, (owner, _) in self.phrases.items() if owner == label])
+                               for label, _ in phrase_sets]
+
+    def match(self, content):
+        """
+        Returns (label, phrase) for the highest-priority phrase found in content, or None.
+        """
+        found = self.pattern.search(content) if self.pattern is not None else None
+        if found is None:
+            return None
+        best = self.phrases[_phrase_key(found.group())]
+        # A higher-priority phrase may overlap this leftmost match, so those labels are searched on their own
+        for pattern in self.label_patterns[:self.ranks[best[0]]]:
+            found = pattern.search(content) if pattern is not None else None
+            if found:
+                return self.phrases[_phrase_key(found.group())]
+        return best
+
+default_matcher = PhraseMatcher()
+
+def heuristic_match(content, matcher=None):
+    """
+    Returns (label, phrase) for the strongest heuristic phrase in content, or None.
+    """
+    return (matcher or default_matcher).match(content)
+
+def heuristic_check(content, matcher=None):
     """
     Checks for specific phrases that strongly indicate interest, disinterest, or neutrality.
     Skips sentiment analysis if a strong indicator is found.
     """
-    not_interested_phrases = ["not interested", "unsubscribe", "stop emailing", "no thanks", "no"]
-    interested_phrases = ["sounds great", "tell me more", "very interested", "let's meet", "interested"]
-    neutral_phrases = [
-        "I'll think about it", "I'll review", "maybe later", 
-        "currently reviewing", "will consider", "will look into it",
-        "need more time", "undecided", "not sure", "possibly"
-    ]
-
-    for phrase in not_interested_phrases:
-        if phrase in content.lower():
-            return "not interested"
-    for phrase in interested_phrases:
-        if phrase in content.lower():
-            return "interested"
-    for phrase in neutral_phrases:
-        if phrase in content.lower():
-            return "neutral"
-    return None
-
-def process_emails(directory, model):
-    """
-    Processes each email in the given directory.
-    Applies text normalization and heuristic checks before sentiment analysis.
+    match = heuristic_match(content, matcher)
+    return match[0] if match else None
+
+def classify_batch(model, texts, batch_size=32):
     """
-    try:
-        email_files = glob.glob(os.path.join(directory, '*.txt'))
-        logging.info(f"Found {len(email_files)} email files in {directory}")
-
-        # Adjust these thresholds as needed
-        interested_threshold = 0.7
-        not_interested_threshold = 0.3
-
-        for filepath in email_files:
-            with open(filepath, 'r', encoding='utf-8') as file:
-                content = file.read()
-                logging.info(f"Processing file {filepath} with content: {content[:100]}")
-
-                normalized_content = normalize_text(content)
-                heuristic_result = heuristic_check(normalized_content)
-                if heuristic_result:
-                    logging.info(f"Heuristic applied for {filepath}: {heuristic_result}")
-                    color = RED if heuristic_result == "not interested" else GREEN if heuristic_result == "interested" else BLUE
-                    print(f"{color}{filepath}: {heuristic_result} (Heuristic){RESET}")
-                    continue
+    Runs the model over a list of normalized texts in batches.
+    Texts are sorted by word count first so each batch holds similar lengths and
+    needs little padding. Results are returned in the same order as the input.
+    """
+    order = sorted(range(len(texts)), key=lambda i: texts[i].count(' '))
+    results = [None] * len(texts)
+    for start in range(0, len(order), batch_size):
+        indices = order[start:start + batch_size]
+        started = time.perf_counter()
+        outputs = model([texts[i] for i in indices], batch_size=len(indices), truncation=True)
+        metrics.observe("model", time.perf_counter() - started, len(indices))
+        metrics.record_batch(len(indices))
+        for i, output in zip(indices, outputs):
+            results[i] = output
+    return results
+
+def positive_score(output):
+    """
+    Returns the probability that a text is POSITIVE from a pipeline output.
+    The pipeline reports the confidence of the top class, which is at least 0.5 for the binary
+    model, so NEGATIVE predictions are folded to 1 - score.
+    """
+    return output["score"] if output["label"] == "POSITIVE" else 1 - output["score"]
+
+def score_to_label(score, interested_threshold=INTERESTED_THRESHOLD,
+                   not_interested_threshold=NOT_INTERESTED_THRESHOLD):
+    """
+    Maps a model score, the probability of POSITIVE from positive_score, to a sentiment label using the thresholds.
+    """
+    if score > interested_threshold:
+        return "interested"
+    if score < not_interested_threshold:
+        return "not interested"
+    return "neutral"
+
+def prepare_email(email_id, content, matcher=None, normalized=False):
+    """
+    Normalizes an email and applies the heuristic check. With normalized set, content is already
+    normalized (for example by iter_normalized) and is used as is.
+    Returns a result dict; emails the heuristics resolve are already labelled, the rest have method "model".
+    """
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug(f"Processing file {email_id} with content: {content[:100]}")
+    start = time.perf_counter()
+    normalized_content = content if normalized else normalize_text(content)
+    normalized_at = time.perf_counter()
+    heuristic_result = heuristic_match(normalized_content, matcher)
+    if not normalized:
+        metrics.observe("normalize", normalized_at - start)
+    metrics.observe("heuristic", time.perf_counter() - normalized_at)
+    return {"id": email_id, "label": heuristic_result[0] if heuristic_result else None, "score": None,
+            "method": "heuristic" if heuristic_result else "model",
+            "phrase": heuristic_result[1] if heuristic_result else None,
+            "normalized": normalized_content, "duplicate_of": None}
 
+def apply_cascade(pending, model_bound, cascade):
+    """
+    Classifies the model-bound results in pending with the cheap cascade classifier. Predictions
+    whose margin reaches cascade.margin are accepted with method "cascade". Like heuristic results
+    they have no score, since score is the model's probability of POSITIVE; the predicted class
+    probability and margin go in cascade_probability and cascade_margin instead.
+    Returns the indices of the low-margin results, which go on to the model.
+    """
+    start = time.perf_counter()
+    labels, probabilities, margins = cascade.predict([pending[i]["normalized"] for i in model_bound])
+    escalated = []
+    for i, label, probability, margin in zip(model_bound, labels, probabilities, margins):
+        if margin >= cascade.margin:
+            pending[i]["label"], pending[i]["method"] = label, "cascade"
+            pending[i]["cascade_probability"], pending[i]["cascade_margin"] = float(probability), float(margin)
+        else:
+            escalated.append(i)
+    metrics.observe("cascade", time.perf_counter() - start, len(model_bound))
+    metrics.count("cascade_accepted", len(model_bound) - len(escalated))
+    metrics.count("cascade_escalated", len(escalated))
+    return escalated
+
+def deduplicate(pending, model_bound, dedup):
+    """
+    Splits the model-bound results in pending into cluster representatives and near-duplicates.
+    Each text is looked up in the NearDuplicateIndex; a match marks the result as method
+    "duplicate" with duplicate_of set to the representative's id, otherwise the result becomes a
+    new representative. Returns (representatives, members), where representatives maps a pending
+    index to its (index key, entry) and members maps a pending index to the entry it copies.
+    """
+    start = time.perf_counter()
+    representatives, members = {}, {}
+    for i in model_bound:
+        signature = dedup.signature(pending[i]["normalized"])
+        match = dedup.query(signature)
+        if match is None:
+            entry = {"id": pending[i]["id"], "label": None, "score": None}
+            representatives[i] = (dedup.add(signature, entry), entry)
+        else:
+            members[i] = match[0]
+            pending[i]["method"] = "duplicate"
+            pending[i]["duplicate_of"] = match[0]["id"]
+    metrics.observe("dedup", time.perf_counter() - start, len(model_bound))
+    return representatives, members
+
+def score_window(pending, model, batch_size=32, interested_threshold=INTERESTED_THRESHOLD,
+                 not_interested_threshold=NOT_INTERESTED_THRESHOLD, cache=None, dedup=None, cascade=None):
+    """
+    Fills in labels and scores for the prepared results in pending that still need the model.
+    Cached texts are taken from the optional ScoreCache, the rest are sorted by length across the
+    window and go through classify_batch in batches of batch_size, and are stored in the cache. With a cascade classifier (cascade.NgramClassifier), texts it classifies
+    confidently after the cache lookup skip the model. With a NearDuplicateIndex, only one representative per cluster of
+    near-identical texts is sent to the model and its label and score are copied to the others.
+    Returns the results in their original order, leaving out failed batches.
+    """
+    model_bound = [i for i, result in enumerate(pending) if result["method"] == "model"]
+    if cache is not None and model_bound:
+        start = time.perf_counter()
+        try:
+            cached = cache.get_many([pending[i]["normalized"] for i in model_bound])
+        except sqlite3.OperationalError as e:
+            # Usually "database is locked" by another worker: score the window without the cache
+            logging.warning(f"Score cache lookup failed, scoring {len(model_bound)} emails with the model: {e}")
+            cached = {}
+        metrics.observe("cache", time.perf_counter() - start, len(model_bound))
+        lookups = len(model_bound)
+        for i in model_bound:
+            if pending[i]["normalized"] in cached:
+                pending[i]["label"], pending[i]["score"] = cached[pending[i]["normalized"]]
+                pending[i]["method"] = "cache"
+        model_bound = [i for i in model_bound if pending[i]["method"] == "model"]
+        metrics.count("cache_hits", lookups - len(model_bound))
+        metrics.count("cache_misses", len(model_bound))
+    if cascade is not None and model_bound:
+        model_bound = apply_cascade(pending, model_bound, cascade)
+    representatives, members = {}, {}
+    if dedup is not None and model_bound:
+        representatives, members = deduplicate(pending, model_bound, dedup)
+        model_bound = list(representatives)
+    failed = set()
+    # Sort the whole window by length before batching, so each model batch holds similar lengths
+    model_bound.sort(key=lambda i: pending[i]["normalized"].count(' '))
+    texts = [pending[i]["normalized"] for i in model_bound]
+    for start in range(0, len(texts), batch_size):
+        chunk = model_bound[start:start + batch_size]
+        try:
+            outputs = classify_batch(model, texts[start:start + batch_size], batch_size)
+        except Exception as e:
+            for i in chunk:
+                logging.error(f"Error in sentiment analysis for {pending[i]['id']}: {e}", exc_info=True)
+            failed.update(chunk)
+            continue
+        for i, output in zip(chunk, outputs):
+            score = positive_score(output)
+            pending[i]["score"] = score
+            pending[i]["label"] = score_to_label(score, interested_threshold, not_interested_threshold)
+        if cache is not None:
+            try:
+                cache.put_many([(pending[i]["normalized"], pending[i]["label"], pending[i]["score"])
+                                for i in chunk])
+            except sqlite3.OperationalError as e:
+                logging.warning(f"Could not store {len(chunk)} scores in the cache: {e}")
+    for i, (key, entry) in representatives.items():
+        if i in failed:
+            dedup.remove(key)
+        else:
+            entry["label"], entry["score"] = pending[i]["label"], pending[i]["score"]
+    for i, entry in members.items():
+        if entry["label"] is None:
+            failed.add(i)
+        else:
+            pending[i]["label"], pending[i]["score"] = entry["label"], entry["score"]
+    return [result for i, result in enumerate(pending) if i not in failed]
+
+def score_emails(records, model, batch_size=32, window=256,
+                 interested_threshold=INTERESTED_THRESHOLD, not_interested_threshold=NOT_INTERESTED_THRESHOLD,
+                 matcher=None, cache=None, dedup=None, cascade=None, normalized=False):
+    """
+    Scores (email_id, content) records and yields a result dict per email in input order.
+    With normalized set, contents are already normalized, as iter_normalized yields them.
+    Emails the heuristic check does not resolve are collected into a window and sent to the
+    model with classify_batch, so the model runs batched forward passes instead of one per email.
+    If a ScoreCache is given, cached texts skip the model and new results are stored in it.
+    If a NearDuplicateIndex is given, near-duplicates of earlier emails reuse their representative's result.
+    If a cascade classifier is given, only the emails it is unsure about reach the model.
+    """
+    pending = []
+    for email_id, content in records:
+        pending.append(prepare_email(email_id, content, matcher, normalized))
+        if len(pending) >= window:
+            yield from score_window(pending, model, batch_size, interested_threshold, not_interested_threshold,
+                                    cache, dedup, cascade)
+            pending = []
+    yield from score_window(pending, model, batch_size, interested_threshold, not_interested_threshold,
+                            cache, dedup, cascade)
+
+# Per-process state for score_emails_parallel workers
+worker_model = None
+worker_cache = None
+worker_dedup = None
+worker_cascade = None
+
+def _init_worker(threads, cache_path, backend, model_path, log_level=None, dedup_threshold=None,
+                 cascade_path=None, cascade_margin=None):
+    global worker_model, worker_cache, worker_dedup, worker_cascade
+    if log_level is not None:
+        # Workers log little and exit without atexit handlers, so they write directly
+        configure_logging(log_level, queued=False)
+    import torch
+    torch.set_num_threads(threads)
+    worker_model = load_model(backend, model_path)
+    if cache_path:
+        worker_cache = ScoreCache(cache_path, model_id(backend, model_path), INTERESTED_THRESHOLD,
+                                  NOT_INTERESTED_THRESHOLD)
+    if dedup_threshold is not None:
+        worker_dedup = NearDuplicateIndex(dedup_threshold)
+    if cascade_path:
+        # cascade imports this module, so it is only imported once sentiment is fully loaded
+        from cascade import NgramClassifier
+        worker_cascade = NgramClassifier.load(cascade_path, cascade_margin)
+    logging.info(f"Worker {os.getpid()} ready with {threads} torch threads")
+
+def _score_shard(records, batch_size, window, normalized=False):
+    # Each worker runs one shard at a time, so its metrics cover exactly this shard
+    metrics.reset()
+    results = list(score_emails(records, worker_model, batch_size, window, cache=worker_cache, dedup=worker_dedup,
+                                cascade=worker_cascade, normalized=normalized))
+    return results, metrics.snapshot()
+
+def score_emails_parallel(records, workers=None, threads_per_worker=None, batch_size=32, window=256,
+                          shard_size=256, cache_path=None, backend="pytorch", model_path=None, dedup_threshold=None,
+                          cascade=None, normalized=False):
+    """
+    Scores (email_id, content) records across a pool of worker processes and yields results in input order.
+    normalized works as in score_emails.
+    Each worker loads the model once at start-up and is limited to threads_per_worker torch threads
+    (by default the cores split evenly across workers) so workers do not oversubscribe the CPU.
+    Records are sent in shards of shard_size, with at most two shards per worker in flight.
+    backend and model_path are passed to load_model in each worker. With dedup_threshold, each worker
+    keeps its own NearDuplicateIndex, so near-duplicates are only found within a worker's shards.
+    Each worker loads its own copy of a saved cascade classifier from cascade.path, so a cascade
+    that was never saved or loaded raises ValueError.
+    Worker metrics are merged into this process's metrics as shards complete.
+    """
+    if cascade is not None and cascade.path is None:
+        raise ValueError("Parallel workers load the cascade classifier from disk; save it first")
+    workers = workers or os.cpu_count()
+    threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    records = iter(records)
+    log_level = logging.getLogger().level if log_listener is not None else None
+    # Spawn rather than fork: forking a process that has imported torch can deadlock its thread pools
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker,
+                             initargs=(threads_per_worker, cache_path, backend, model_path, log_level, dedup_threshold,
+                                       cascade.path if cascade is not None else None,
+                                       cascade.margin if cascade is not None else None)) as executor:
+        in_flight = deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(in_flight) < workers * 2:
+                shard = list(islice(records, shard_size))
+                if shard:
+                    in_flight.append(executor.submit(_score_shard, shard, batch_size, window, normalized))
+                else:
+                    exhausted = True
+            if not in_flight:
+                break
+            results, snapshot = in_flight.popleft().result()
+            metrics.merge(snapshot)
+            yield from results
+
+class StageStats:
+    """
+    Throughput counters for one stage of score_emails_pipelined.
+    busy_seconds is the time the stage spent working, summed over its threads. Utilization near
+    100% marks the bottleneck; low utilization means the stage waits on its neighbours.
+    """
+
+    def __init__(self, name, threads=1):
+        self.name = name
+        self.threads = threads
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.started = time.perf_counter()
+        self.finished = None
+        self.lock = threading.Lock()
+
+    def add(self, items, seconds):
+        with self.lock:
+            self.items += items
+            self.busy_seconds += seconds
+
+    def summary(self):
+        wall_seconds = (self.finished or time.perf_counter()) - self.started
+        return {"stage": self.name, "items": self.items, "busy_seconds": self.busy_seconds,
+                "items_per_second": self.items / wall_seconds if wall_seconds else 0.0,
+                "utilization": self.busy_seconds / (wall_seconds * self.threads) if wall_seconds else 0.0}
+
+def format_stage_report(stage_stats):
+    """
+    Formats per-stage throughput as a table.
+    """
+    lines = [f"{'stage':<12}{'items':>10}{'items/s':>12}{'busy s':>10}{'utilization':>13}"]
+    for stats in stage_stats:
+        row = stats.summary()
+        lines.append(f"{row['stage']:<12}{row['items']:>10}{row['items_per_second']:>12.1f}"
+                     f"{row['busy_seconds']:>10.2f}{row['utilization']:>12.0%}")
+    return "\n".join(lines)
+
+# Marks the end of a stage's output in score_emails_pipelined
+STAGE_DONE = object()
+
+def _put(stage_queue, item, stop):
+    while not stop.is_set():
+        try:
+            stage_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(stage_queue, stop):
+    while not stop.is_set():
+        try:
+            return stage_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return STAGE_DONE
+
+def score_emails_pipelined(source, model, batch_size=32, window=256, read_workers=8, queue_size=1024,
+                           cache=None, matcher=None, skip=None, record_filter=None, stage_stats=None, dedup=None,
+                           cascade=None, stream=False):
+    """
+    Scores the emails in source with overlapping read, prepare and inference stages, yielding results in order.
+    Files are read by a pool of read_workers threads (sequential sources such as mbox use one thread),
+    a second thread normalizes and applies the heuristics, and a third batches whatever is waiting and
+    runs score_window. Stages are connected by queues of queue_size items, so a slow stage applies
+    backpressure upstream. skip is passed to the source and record_filter (such as Manifest.filter)
+    wraps the read records. dedup and cascade are passed to score_window. With stream set, the read
+    stage normalizes as it reads (see iter_normalized), so files are read only up to the reply's end.
+    Per-stage StageStats are appended to stage_stats and logged at the end.
+    """
+    read_stats, prepare_stats, inference_stats = (StageStats("read", read_workers), StageStats("prepare"),
+                                                  StageStats("inference"))
+    stages = [read_stats, prepare_stats, inference_stats]
+    if stage_stats is not None:
+        stage_stats.extend(stages)
+    read_queue, prepared_queue, output_queue = (queue.Queue(queue_size) for _ in range(3))
+    stop = threading.Event()
+    errors = []
+
+    def timed_read(path, mime):
+        start = time.perf_counter()
+        content = read_normalized(path, mime) if stream else read_message_file(path, mime)
+        read_stats.add(1, time.perf_counter() - start)
+        return path, content
+
+    def pooled_reads(files):
+        with ThreadPoolExecutor(read_workers) as pool:
+            in_flight = deque()
+            for path, mime in files:
+                in_flight.append(pool.submit(timed_read, path, mime))
+                if len(in_flight) >= read_workers * 4:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+
+    def sequential_reads(records):
+        while True:
+            start = time.perf_counter()
+            record = next(records, STAGE_DONE)
+            if record is STAGE_DONE:
+                return
+            read_stats.add(1, time.perf_counter() - start)
+            yield record
+
+    def run_stage(body):
+        def target():
+            try:
+                body()
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        return thread
+
+    def read_stage():
+        files = iter_source_files(source, skip)
+        if files is not None:
+            records = pooled_reads(files)
+        else:
+            read_stats.threads = 1
+            records = sequential_reads(iter_normalized(source, skip) if stream else iter_source(source, skip))
+        if record_filter is not None:
+            records = record_filter(records)
+        for record in records:
+            if not _put(read_queue, record, stop):
+                return
+        read_stats.finished = time.perf_counter()
+        _put(read_queue, STAGE_DONE, stop)
+
+    def prepare_stage():
+        while True:
+            record = _get(read_queue, stop)
+            if record is STAGE_DONE:
+                break
+            start = time.perf_counter()
+            result = prepare_email(*record, matcher, stream)
+            prepare_stats.add(1, time.perf_counter() - start)
+            if not _put(prepared_queue, result, stop):
+                return
+        prepare_stats.finished = time.perf_counter()
+        _put(prepared_queue, STAGE_DONE, stop)
+
+    def inference_stage():
+        done = False
+        while not done:
+            result = _get(prepared_queue, stop)
+            if result is STAGE_DONE:
+                break
+            # Take whatever else is already waiting, up to one full model batch
+            pending = [result]
+            model_bound = int(result["method"] == "model")
+            while model_bound < batch_size and len(pending) < window:
                 try:
-                    result = model(normalized_content)[0]
-                    score = result['score']
-                    label = "interested" if score > interested_threshold else "not interested" if score < not_interested_threshold else "neutral"
-                    color = GREEN if label == "interested" else RED if label == "not interested" else BLUE
-                    logging.info(f"Processed {filepath}: {label} ({score})")
-                    print(f"{color}{filepath}: {label} ({score}){RESET}")
+                    result = prepared_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if result is STAGE_DONE:
+                    done = True
+                    break
+                pending.append(result)
+                model_bound += result["method"] == "model"
+            start = time.perf_counter()
+            results = score_window(pending, model, batch_size, cache=cache, dedup=dedup, cascade=cascade)
+            inference_stats.add(len(pending), time.perf_counter() - start)
+            for result in results:
+                if not _put(output_queue, result, stop):
+                    return
+        inference_stats.finished = time.perf_counter()
+        _put(output_queue, STAGE_DONE, stop)
+
+    threads = [run_stage(read_stage), run_stage(prepare_stage), run_stage(inference_stage)]
+    try:
+        while True:
+            try:
+                result = output_queue.get(timeout=0.1)
+            except queue.Empty:
+                if errors:
+                    raise errors[0]
+                continue
+            if result is STAGE_DONE:
+                break
+            yield result
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        logging.info(f"Pipeline stage throughput:\n{format_stage_report(stages)}")
+
+def report_result(result, quiet=False):
+    """
+    Prints a single scored email, unless quiet is set, and logs it at DEBUG level.
+    """
+    filepath, label, score = result["id"], result["label"], result["score"]
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    if quiet and not debug:
+        return
+    color = GREEN if label == "interested" else RED if label == "not interested" else BLUE
+    if result["method"] == "heuristic":
+        if debug:
+            logging.debug(f"Heuristic applied for {filepath}: {label} (matched '{result['phrase']}')")
+        line = f"{color}{filepath}: {label} (Heuristic){RESET}"
+    elif result["method"] == "cache":
+        if debug:
+            logging.debug(f"Cached result for {filepath}: {label} ({score})")
+        line = f"{color}{filepath}: {label} ({score}) (Cached){RESET}"
+    elif result["method"] == "cascade":
+        if debug:
+            logging.debug(f"Cascade classified {filepath}: {label} ({result['cascade_probability']}, "
+                          f"margin {result['cascade_margin']})")
+        line = f"{color}{filepath}: {label} ({result['cascade_probability']:.3f}) (Cascade){RESET}"
+    elif result["method"] == "duplicate":
+        if debug:
+            logging.debug(f"Near-duplicate {filepath} of {result['duplicate_of']}: {label} ({score})")
+        line = f"{color}{filepath}: {label} ({score}) (Duplicate of {result['duplicate_of']}){RESET}"
+    else:
+        if debug:
+            logging.debug(f"Processed {filepath}: {label} ({score}), content: {result['normalized'][:100]}")
+        line = f"{color}{filepath}: {label} ({score}){RESET}"
+    if not quiet:
+        print(line)
 
-                    # Debugging: log the score and content for review
-                    logging.debug(f"Email: {filepath}, Score: {score}, Content: {normalized_content[:100]}")
+def process_emails(source, model, batch_size=32, window=256, cache=None, workers=1, threads_per_worker=None,
+                   manifest=None, pipelined=False, read_workers=8, backend="pytorch", model_path=None,
+                   quiet=False, dedup=None, cascade=None, stream=False):
+    """
+    Processes each email in the given source: a directory of .txt/.eml files, a Maildir tree,
+    an mbox file or a JSONL file. Emails are read lazily, one at a time, so memory stays flat.
+    Applies text normalization and heuristic checks before sentiment analysis.
+    Emails that need the model are scored in batches of batch_size; window bounds how many
+    emails are buffered for length-sorting before results are reported in file order.
+    Results already in the optional ScoreCache are reused instead of re-running the model.
+    With workers > 1 the emails are sharded across processes that each load their own model
+    with load_model(backend, model_path), so model may be None.
+    With a Manifest, only new or changed emails are processed and each result is recorded in it,
+    with periodic checkpoints so an interrupted run can resume.
+    With pipelined set (and a single worker), reads, normalization and inference overlap in
+    separate stages and a per-stage throughput report is printed at the end.
+    With a NearDuplicateIndex, near-duplicate emails reuse the result of their cluster's representative.
+    With a cascade classifier, emails it classifies confidently skip the model.
+    With stream set, emails are normalized while they are read (iter_normalized), so message files
+    are only read up to the first signature or quoted reply.
+    Every result is recorded in metrics; quiet suppresses the per-email output line.
+    """
+    try:
+        skip = manifest.is_unchanged if manifest is not None else None
+        record_filter = None
+        if manifest is not None:
+            # Only file-per-message sources have ids that are paths worth a stat
+            files = iter_source_files(source) is not None
+            record_filter = lambda records: manifest.filter(records, files=files)
+        stage_stats = []
+        if pipelined and workers <= 1:
+            results = score_emails_pipelined(source, model, batch_size, window, read_workers, cache=cache,
+                                             skip=skip, record_filter=record_filter, stage_stats=stage_stats,
+                                             dedup=dedup, cascade=cascade, stream=stream)
+        else:
+            if stream:
+                records = iter_normalized(source, skip)
+            else:
+                records = iter_source(source, skip=skip)
+            if record_filter is not None:
+                records = record_filter(records)
+            if workers > 1:
+                results = score_emails_parallel(records, workers, threads_per_worker, batch_size, window,
+                                                cache_path=cache.path if cache is not None else None,
+                                                backend=backend, model_path=model_path,
+                                                dedup_threshold=dedup.threshold if dedup is not None else None,
+                                                cascade=cascade, normalized=stream)
+            else:
+                results = score_emails(records, model, batch_size, window, cache=cache, dedup=dedup, cascade=cascade,
+                                       normalized=stream)
+        count = 0
+        try:
+            for result in results:
+                metrics.record_result(result)
+                report_result(result, quiet)
+                if manifest is not None:
+                    manifest.record(result)
+                count += 1
+        finally:
+            if manifest is not None:
+                manifest.checkpoint()
+        logging.info(f"Processed {count} emails from {source}")
+        if stage_stats:
+            print(format_stage_report(stage_stats))
+        if manifest is not None:
+            logging.info(f"Manifest stats: {manifest.stats()}")
 
-                except Exception as e:
-                    logging.error(f"Error in sentiment analysis for {filepath}: {e}", exc_info=True)
+        if cache is not None:
+            logging.info(f"Score cache stats: {cache.stats()}")
+        if dedup is not None and workers <= 1:
+            logging.info(f"Near-duplicate index stats: {dedup.stats()}")
 
     except Exception as e:
         logging.error(f"Error processing emails: {e}", exc_info=True)
         raise
 
-def main():
-    model = load_model()
-    email_directory = "test_emails"
-    process_emails(email_directory, model)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify B2B email replies by sentiment.")
+    parser.add_argument("source", nargs="?", default="test_emails",
+                        help="Directory of .txt/.eml emails, Maildir tree, mbox file or JSONL file")
+    parser.add_argument("--batch-size", type=int, default=32, help="Emails per model forward pass")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, each with its own model")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Torch intra-op threads per worker (default: cores / workers)")
+    parser.add_argument("--backend", choices=BACKENDS, default="pytorch", help="Model inference backend")
+    parser.add_argument("--model-path", default=None, help="Local model directory, loaded without network access")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the score cache")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only process emails that are new or changed since the last run, with resume")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="Overlap file reads, normalization and inference in separate stages")
+    parser.add_argument("--read-workers", type=int, default=8, help="File reader threads in pipelined mode")
+    parser.add_argument("--stream", action="store_true",
+                        help="Normalize emails while reading them, stopping at the first signature or quoted reply")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Score one representative per cluster of near-duplicate emails")
+    parser.add_argument("--dedup-threshold", type=float, default=0.8,
+                        help="Estimated Jaccard similarity at which emails count as near-duplicates")
+    parser.add_argument("--cascade", default=None,
+                        help="Trained cascade classifier (see cascade.py) that answers confident emails before the model")
+    parser.add_argument("--cascade-margin", type=float, default=None,
+                        help="Confidence margin for accepting cascade predictions (default: the stored one)")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO",
+                        help="Verbosity of logs/analysis.log; DEBUG logs every email")
+    parser.add_argument("--quiet", action="store_true", help="Do not print a line per email")
+    parser.add_argument("--metrics", choices=["summary", "prometheus", "none"], default="summary",
+                        help="Metrics report printed at the end of the run")
+    parser.add_argument("--metrics-file", default=None, help="Also write Prometheus-format metrics to this file")
+    args = parser.parse_args(argv)
+
+    listener = configure_logging(args.log_level)
+    cache = manifest = None
+    try:
+        model = load_model(args.backend, args.model_path) if args.workers <= 1 else None
+        cache = None if args.no_cache else ScoreCache(CACHE_PATH, model_id(args.backend, args.model_path),
+                                                      INTERESTED_THRESHOLD, NOT_INTERESTED_THRESHOLD)
+        manifest = Manifest(MANIFEST_PATH) if args.incremental else None
+        cascade = None
+        if args.cascade:
+            from cascade import NgramClassifier
+            cascade = NgramClassifier.load(args.cascade, args.cascade_margin)
+        process_emails(args.source, model, args.batch_size, cache=cache,
+                       workers=args.workers, threads_per_worker=args.threads_per_worker, manifest=manifest,
+                       pipelined=args.pipelined, read_workers=args.read_workers,
+                       backend=args.backend, model_path=args.model_path, quiet=args.quiet,
+                       dedup=NearDuplicateIndex(args.dedup_threshold) if args.dedup else None, cascade=cascade,
+                       stream=args.stream)
+        if args.metrics == "summary":
+            print(metrics.render_summary())
+        elif args.metrics == "prometheus":
+            print(metrics.render_prometheus(), end="")
+        if args.metrics_file:
+            with open(args.metrics_file, "w") as f:
+                f.write(metrics.render_prometheus())
+    finally:
+        if cache is not None:
+            cache.close()
+        if manifest is not None:
+            manifest.close()
+        listener.stop()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,239 @@
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import sentiment as sa
+from metrics import metrics
+from score_cache import ScoreCache
+
+# Largest request body accepted, in bytes
+MAX_BODY_SIZE = 10 * 1024 * 1024
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error"}
+
+class MicroBatcher:
+    """
+    Merges model-bound emails from concurrent requests into micro-batches.
+    A batch is sent to the model once it holds max_batch_size emails or its first email has waited
+    max_wait_ms, whichever comes first. Emails go through the same prepare_email (normalize and
+    heuristic) and score_window (cache, model and thresholds) steps as process_emails. Requests are
+    prepared on a worker thread pool and the model runs on a single background thread, so the event
+    loop keeps accepting requests even while a large body is normalized.
+    """
+
+    def __init__(self, model, max_batch_size=32, max_wait_ms=5, cache=None):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.cache = cache
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(1)
+        self.prepare_executor = ThreadPoolExecutor()
+        self.batches = 0
+        self.batched_emails = 0
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown()
+        self.prepare_executor.shutdown()
+
+    async def score(self, emails):
+        """
+        Scores a list of (email_id, content) pairs and returns their results in order.
+        """
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(self.prepare_executor, self.prepare, emails)
+        waiting = []
+        for result in results:
+            if result["method"] == "model":
+                future = loop.create_future()
+                self.queue.put_nowait((result, future))
+                waiting.append(future)
+        await asyncio.gather(*waiting)
+        return results
+
+    @staticmethod
+    def prepare(emails):
+        return [sa.prepare_email(email_id, content) for email_id, content in emails]
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            pending = [result for result, _ in batch]
+            try:
+                scored = await loop.run_in_executor(self.executor, sa.score_window, pending, self.model,
+                                                    self.max_batch_size, sa.INTERESTED_THRESHOLD,
+                                                    sa.NOT_INTERESTED_THRESHOLD, self.cache)
+            except Exception as e:
+                logging.error(f"Error scoring batch of {len(batch)}: {e}", exc_info=True)
+                scored = []
+            self.batches += 1
+            self.batched_emails += len(batch)
+            succeeded = set(map(id, scored))
+            for result, future in batch:
+                if future.done():
+                    continue
+                if id(result) in succeeded:
+                    future.set_result(result)
+                else:
+                    future.set_exception(RuntimeError(f"Sentiment analysis failed for {result['id']}"))
+
+class ScoringService:
+    """
+    Local HTTP service that keeps the model loaded and scores emails on request.
+    POST /score takes {"email": "..."} or {"emails": ["...", ...]} and returns {"results": [...]}.
+    GET /health reports batching counters and GET /metrics returns metrics in Prometheus text format.
+    """
+
+    def __init__(self, model, max_batch_size=32, max_wait_ms=5, cache=None):
+        self.batcher = MicroBatcher(model, max_batch_size, max_wait_ms, cache)
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=8080, unix_socket=None):
+        self.batcher.start()
+        if unix_socket:
+            self.server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, host, port)
+        logging.info(f"Scoring service listening on {unix_socket or self.server.sockets[0].getsockname()}")
+        return self.server
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        await self.batcher.stop()
+
+    async def dispatch(self, method, path, body):
+        """
+        Routes a request and returns (status, payload); payload is a dict sent as JSON or plain text.
+        """
+        if path == "/metrics":
+            if method != "GET":
+                return 405, {"error": "Use GET"}
+            return 200, metrics.render_prometheus()
+        if path == "/health":
+            if method != "GET":
+                return 405, {"error": "Use GET"}
+            return 200, {"status": "ok", "batches": self.batcher.batches,
+                         "batched_emails": self.batcher.batched_emails}
+        if path != "/score":
+            return 404, {"error": f"Unknown path {path}"}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+        try:
+            request = json.loads(body or b'{}')
+            emails = [request["email"]] if "email" in request else request["emails"]
+            if not all(isinstance(email, str) for email in emails):
+                raise TypeError("emails must be strings")
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {"error": f"Expected {{\"email\": str}} or {{\"emails\": [str]}}: {e}"}
+        try:
+            results = await self.batcher.score(list(enumerate(emails)))
+        except RuntimeError as e:
+            return 500, {"error": str(e)}
+        for result in results:
+            metrics.record_result(result)
+        return 200, {"results": [{"label": result["label"], "score": result["score"], "method": result["method"],
+                                  "phrase": result["phrase"]} for result in results]}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY_SIZE:
+                    await self.respond(writer, 413, {"error": "Request body too large"}, close=True)
+                    break
+                body = await reader.readexactly(length)
+                status, payload = await self.dispatch(method, path.split('?', 1)[0], body)
+                close = headers.get('connection', '').lower() == 'close'
+                await self.respond(writer, status, payload, close)
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, close=False):
+        if isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload).encode('utf-8'), "application/json"
+        writer.write(f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                     f"Content-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n".encode('latin-1') + body)
+        await writer.drain()
+
+async def serve(model, host, port, unix_socket=None, max_batch_size=32, max_wait_ms=5, cache=None):
+    service = ScoringService(model, max_batch_size, max_wait_ms, cache)
+    server = await service.start(host, port, unix_socket)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve email sentiment scoring over HTTP with micro-batching.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="TCP port to listen on")
+    parser.add_argument("--unix-socket", default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--max-batch-size", type=int, default=32, help="Most emails per model call")
+    parser.add_argument("--max-wait-ms", type=float, default=5, help="Longest wait to fill a batch")
+    parser.add_argument("--backend", choices=sa.BACKENDS, default="pytorch", help="Model inference backend")
+    parser.add_argument("--model-path", default=None, help="Local model directory")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the score cache")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO",
+                        help="Verbosity of logs/analysis.log")
+    args = parser.parse_args(argv)
+
+    listener = sa.configure_logging(args.log_level)
+    cache = None
+    try:
+        model = sa.load_model(args.backend, args.model_path)
+        cache = None if args.no_cache else ScoreCache(sa.CACHE_PATH, sa.model_id(args.backend, args.model_path),
+                                                      sa.INTERESTED_THRESHOLD, sa.NOT_INTERESTED_THRESHOLD)
+        asyncio.run(serve(model, args.host, args.port, args.unix_socket, args.max_batch_size, args.max_wait_ms, cache))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if cache is not None:
+            cache.close()
+        listener.stop()
+
+if __name__ == "__main__":
+    main()
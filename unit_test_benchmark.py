@@ -0,0 +1,57 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import benchmark as bm
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = list(range(1, 101))
+        self.assertEqual(bm.percentile(values, 0.5), 50)
+        self.assertEqual(bm.percentile(values, 0.99), 99)
+        self.assertEqual(bm.percentile([3.0], 0.99), 3.0)
+        self.assertIsNone(bm.percentile([], 0.5))
+
+    def test_build_corpus_is_deterministic(self):
+        """Test that the synthetic corpus depends only on size and seed."""
+        self.assertEqual(bm.build_corpus(30, seed=4), bm.build_corpus(30, seed=4))
+        self.assertNotEqual(bm.build_corpus(30, seed=4), bm.build_corpus(30, seed=5))
+        self.assertEqual([email_id for email_id, _ in bm.build_corpus(3)],
+                         ["interested_1", "neutral_2", "not_interested_3"])
+
+    def test_run_suite_without_model(self):
+        """Test that the model-free stages produce machine-readable rows for each size."""
+        results = bm.run_suite([20, 40], include_model=False)
+        self.assertEqual([(row["stage"], row["size"]) for row in results["results"]],
+                         [("normalize_text", 20), ("heuristic_check", 20),
+                          ("normalize_text", 40), ("heuristic_check", 40)])
+        for row in results["results"]:
+            self.assertGreater(row["emails_per_second"], 0)
+            self.assertLessEqual(row["p50_ms"], row["p99_ms"])
+            self.assertGreater(row["peak_rss_mb"], 0)
+            self.assertGreaterEqual(row["rss_growth_mb"], 0)
+
+    def test_compare_results_flags_regressions(self):
+        """Test that throughput drops beyond the tolerance are flagged."""
+        baseline = {"results": [bm.summarize("normalize_text", 10, 100, 1.0),
+                                bm.summarize("inference", 10, 100, 1.0, batch_size=8)]}
+        current = {"results": [bm.summarize("normalize_text", 10, 100, 1.05),
+                               bm.summarize("inference", 10, 100, 2.0, batch_size=8),
+                               bm.summarize("inference", 10, 100, 1.0, batch_size=32)]}
+        rows = bm.compare_results(baseline, current, tolerance=0.10)
+        self.assertEqual([(row["stage"], row["regression"]) for row in rows],
+                         [("normalize_text", False), ("inference", True)])
+        self.assertAlmostEqual(rows[1]["change"], -0.5)
+
+    @patch('sentiment.load_model')
+    def test_compare_backends_label_flip(self, mock_load_model):
+        """Test that a flip between POSITIVE 0.51 and NEGATIVE 0.51 counts as disagreement and drift."""
+        outputs = {"pytorch": {"label": "POSITIVE", "score": 0.51}, "int8": {"label": "NEGATIVE", "score": 0.51}}
+        mock_load_model.side_effect = lambda backend, model_path: MagicMock(
+            side_effect=lambda texts, **kwargs: [outputs[backend]] * len(texts))
+        rows = bm.compare_backends([("a", "Looks promising")], ["pytorch", "int8"])
+        self.assertEqual([row["label_agreement"] for row in rows], [1.0, 0.0])
+        self.assertAlmostEqual(rows[1]["max_score_drift"], 0.02)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import MagicMock, patch
+import numpy as np
+import cascade
+import sentiment as sa
+
+TEXTS = ["Sounds like a great fit please send the proposal", "Let us schedule a demo next week",
+         "We will review this internally and get back to you", "Still evaluating options at the moment",
+         "We already have a provider for this", "Please remove us from your list"]
+LABELS = ["interested", "interested", "neutral", "neutral", "not interested", "not interested"]
+
+class TestNgramClassifier(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.classifier = cascade.NgramClassifier(n_features=2 ** 12).fit(TEXTS * 20, LABELS * 20, epochs=10, batch_size=8)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_fit_and_predict(self):
+        """Test that the classifier learns its training texts with confident margins."""
+        labels, probabilities, margins = self.classifier.predict(TEXTS)
+        self.assertEqual(labels, LABELS)
+        self.assertTrue((margins > 0.5).all())
+        self.assertTrue(((probabilities > 0) & (probabilities <= 1)).all())
+        self.assertEqual(self.classifier.predict([])[0], [])
+
+    def test_save_and_load(self):
+        """Test that a saved classifier predicts the same and the margin can be overridden."""
+        path = os.path.join(self.directory, "cascade.npz")
+        self.classifier.save(path)
+        loaded = cascade.NgramClassifier.load(path, margin=0.9)
+        np.testing.assert_allclose(loaded.predict_proba(TEXTS), self.classifier.predict_proba(TEXTS))
+        self.assertEqual((loaded.margin, loaded.path), (0.9, path))
+        self.assertEqual(cascade.NgramClassifier.load(path).margin, 0.5)
+
+    def test_margin_report(self):
+        """Test escalation rate and kept accuracy per margin threshold."""
+        rows = cascade.margin_report(["a", "b", "c", "d"], ["a", "x", "c", "d"], [0.9, 0.1, 0.6, 0.3], [0, 0.5])
+        self.assertEqual(rows[0], {"margin": 0.0, "escalation_rate": 0.0, "cascade_accuracy": 0.75})
+        self.assertEqual(rows[1], {"margin": 0.5, "escalation_rate": 0.5, "cascade_accuracy": 1.0})
+
+    def test_evaluate_cascade(self):
+        """Test per-stage counts and accuracy with heuristics, the cascade and an escalated email."""
+        model = MagicMock(side_effect=lambda texts, **kwargs: [{"label": "POSITIVE", "score": 0.5} for t in texts])
+        texts = ["Please unsubscribe me", TEXTS[0], "zzz qqq"]
+        report = cascade.evaluate_cascade(texts, ["not interested", "interested", "neutral"], self.classifier, model)
+        self.assertEqual({name: stage["emails"] for name, stage in report["stages"].items()},
+                         {"heuristic": 1, "cascade": 1, "model": 1})
+        self.assertEqual(report["escalation_rate"], 0.5)
+        self.assertEqual(report["accuracy"], 1.0)
+
+    def test_score_emails_with_cascade(self):
+        """Test that confident emails skip the model and only low-margin ones are escalated."""
+        model = MagicMock(side_effect=lambda texts, **kwargs: [{"label": "POSITIVE", "score": 0.9} for t in texts])
+        records = [("a.txt", TEXTS[4]), ("b.txt", "zzz qqq"), ("c.txt", "Please unsubscribe me")]
+        results = list(sa.score_emails(records, model, cascade=self.classifier))
+        self.assertEqual([r["method"] for r in results], ["cascade", "model", "heuristic"])
+        self.assertEqual(results[0]["label"], "not interested")
+        self.assertIsNone(results[0]["score"])
+        self.assertGreater(results[0]["cascade_probability"], 0.5)
+        self.assertGreaterEqual(results[0]["cascade_margin"], self.classifier.margin)
+        with redirect_stdout(io.StringIO()) as output:
+            sa.report_result(results[0])
+        self.assertIn("(Cascade)", output.getvalue())
+        model.assert_called_once_with(["zzz qqq"], batch_size=1, truncation=True)
+
+    def test_train_shuffles_before_holdout(self):
+        """Test that a source grouped by class is shuffled with the seed before the holdout split."""
+        source = os.path.join(self.directory, "corpus.jsonl")
+        with open(source, 'w', encoding='utf-8') as file:
+            for i, (text, label) in enumerate(sorted(zip(TEXTS * 10, LABELS * 10), key=lambda pair: pair[1])):
+                file.write(json.dumps({"id": f"m{i}", "body": text, "label": label}) + "\n")
+        output = os.path.join(self.directory, "cascade.npz")
+        with patch('cascade.margin_report', wraps=cascade.margin_report) as report, redirect_stdout(io.StringIO()):
+            cascade.main(["train", "--source", source, "--holdout", "0.2", "--epochs", "1", "--output", output])
+        held_out = report.call_args[0][0]
+        self.assertEqual(len(held_out), 12)
+        self.assertGreater(len(set(held_out)), 1)
+
+    def test_parallel_requires_saved_cascade(self):
+        """Test that parallel scoring rejects a cascade its workers cannot load instead of dropping it."""
+        with self.assertRaises(ValueError):
+            list(sa.score_emails_parallel([("a.txt", TEXTS[0])], workers=2, cascade=self.classifier))
+
+    def test_synthetic_examples(self):
+        """Test that synthetic training data is deterministic and normalized."""
+        texts, labels = cascade.synthetic_examples(20, seed=3)
+        self.assertEqual((texts, labels), cascade.synthetic_examples(20, seed=3))
+        self.assertTrue(set(labels) <= set(cascade.CLASSES))
+        self.assertFalse(any("@" in text for text in texts))
+
+if __name__ == '__main__':
+    unittest.main()
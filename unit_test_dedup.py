@@ -0,0 +1,53 @@
+import unittest
+from dedup import NearDuplicateIndex, lsh_bands
+
+class TestNearDuplicateIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = NearDuplicateIndex(threshold=0.7)
+        self.template = ("we have reviewed your proposal and would like to schedule a call next week "
+                         "to go over pricing and the onboarding timeline for our team")
+
+    def test_near_duplicates_match(self):
+        """Test that a reply differing only in its greeting and name matches its representative."""
+        self.index.add(self.index.signature(f"Hi John {self.template} Best Anna"), {"id": "a"})
+        match = self.index.query(self.index.signature(f"Hello Maria {self.template} Best Tom"))
+        self.assertIsNotNone(match)
+        self.assertEqual(match[0]["id"], "a")
+        self.assertGreaterEqual(match[1], 0.7)
+
+    def test_different_texts_do_not_match(self):
+        """Test that unrelated replies and short opposite replies stay apart."""
+        self.index.add(self.index.signature(self.template), {"id": "a"})
+        self.index.add(self.index.signature("I am interested please send details"), {"id": "b"})
+        self.assertIsNone(self.index.query(self.index.signature("Please remove me from your mailing list")))
+        self.assertIsNone(self.index.query(self.index.signature("I am not interested please stop")))
+        self.assertEqual(self.index.stats()["matches"], 0)
+
+    def test_signature_is_deterministic(self):
+        """Test that signatures do not depend on the process, so workers agree."""
+        other = NearDuplicateIndex(threshold=0.7)
+        self.assertTrue((self.index.signature(self.template) == other.signature(self.template)).all())
+        self.assertEqual(self.index.signature("").shape, (128,))
+
+    def test_eviction_and_remove(self):
+        """Test that the index keeps at most max_entries and removed entries no longer match."""
+        index = NearDuplicateIndex(threshold=0.7, max_entries=2)
+        keys = [index.add(index.signature(f"reply number {i} {self.template}"), {"id": i}) for i in range(3)]
+        self.assertEqual(list(index.entries), keys[1:])
+        index.remove(keys[1])
+        index.remove(keys[2])
+        self.assertEqual(index.buckets, {})
+        self.assertIsNone(index.query(index.signature(self.template)))
+
+    def test_lsh_bands(self):
+        """Test that the band layout covers the signature and tracks the threshold."""
+        for threshold in (0.5, 0.8, 0.9):
+            bands, rows = lsh_bands(threshold, 128)
+            self.assertEqual(bands * rows, 128)
+        self.assertLess(lsh_bands(0.5, 128)[1], lsh_bands(0.9, 128)[1])
+        with self.assertRaises(ValueError):
+            NearDuplicateIndex(threshold=0)
+
+if __name__ == '__main__':
+    unittest.main()
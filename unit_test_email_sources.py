@@ -0,0 +1,137 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import email_sources as es
+
+PLAIN_MESSAGE = (
+    "From: buyer@example.com\n"
+    "To: sales@example.com\n"
+    "Subject: Re: Proposal\n"
+    "Content-Type: text/plain; charset=utf-8\n"
+    "\n"
+    "{body}\n"
+)
+
+MULTIPART_MESSAGE = (
+    "From: buyer@example.com\n"
+    "Subject: Re: Proposal\n"
+    "MIME-Version: 1.0\n"
+    "Content-Type: multipart/alternative; boundary=XYZ\n"
+    "\n"
+    "--XYZ\n"
+    "Content-Type: text/html; charset=utf-8\n"
+    "\n"
+    "<p>Html version</p>\n"
+    "--XYZ\n"
+    "Content-Type: text/plain; charset=utf-8\n"
+    "Content-Transfer-Encoding: quoted-printable\n"
+    "\n"
+    "Plain version, caf=C3=A9\n"
+    "--XYZ--\n"
+)
+
+class TestEmailSources(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, relative_path, content):
+        path = os.path.join(self.directory, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def test_directory_reads_txt_and_eml(self):
+        """Test that a directory source yields .txt files as-is and parses .eml files."""
+        self.write("mail/a.txt", "Plain text reply")
+        self.write("mail/b.eml", PLAIN_MESSAGE.format(body="MIME reply"))
+        self.write("mail/notes.md", "ignored")
+        results = dict(es.iter_source(os.path.join(self.directory, "mail")))
+        self.assertEqual({os.path.basename(k): v.strip() for k, v in results.items()},
+                         {"a.txt": "Plain text reply", "b.eml": "MIME reply"})
+
+    def test_directory_skip(self):
+        """Test that skipped files are never opened."""
+        self.write("mail/a.txt", "first")
+        self.write("mail/b.txt", "second")
+        results = list(es.iter_directory(os.path.join(self.directory, "mail"),
+                                         skip=lambda path, stat: path.endswith("a.txt")))
+        self.assertEqual([body for _, body in results], ["second"])
+
+    def test_extract_text_prefers_plain_part(self):
+        """Test that multipart messages yield the decoded text/plain part."""
+        message = es.parse_message(MULTIPART_MESSAGE.encode('utf-8'))
+        self.assertEqual(es.extract_text(message).strip(), "Plain version, café")
+
+    def test_maildir(self):
+        """Test that a Maildir tree, including subfolders, is detected and parsed."""
+        for name in ("cur", "new", "tmp", ".Archive/cur", ".Archive/new", ".Archive/tmp"):
+            os.makedirs(os.path.join(self.directory, "Maildir", name))
+        self.write("Maildir/new/1", PLAIN_MESSAGE.format(body="new reply"))
+        self.write("Maildir/cur/2:2,S", PLAIN_MESSAGE.format(body="read reply"))
+        self.write("Maildir/.Archive/cur/3:2,S", PLAIN_MESSAGE.format(body="archived reply"))
+        self.write("Maildir/tmp/4", PLAIN_MESSAGE.format(body="incomplete"))
+        bodies = sorted(body.strip() for _, body in es.iter_source(os.path.join(self.directory, "Maildir")))
+        self.assertEqual(bodies, ["archived reply", "new reply", "read reply"])
+
+    def test_mbox(self):
+        """Test that an mbox file is split into messages and From-quoting is undone."""
+        path = self.write("export.mbox",
+                          "From buyer@example.com Mon Jan  1 00:00:00 2024\n"
+                          + PLAIN_MESSAGE.format(body="First reply\n>From the team")
+                          + "\nFrom other@example.com Mon Jan  1 00:00:00 2024\n"
+                          + MULTIPART_MESSAGE)
+        results = list(es.iter_source(path))
+        self.assertEqual([email_id for email_id, _ in results], [f"{path}#0", f"{path}#1"])
+        self.assertEqual(results[0][1].strip(), "First reply\nFrom the team")
+        self.assertEqual(results[1][1].strip(), "Plain version, café")
+
+    def test_jsonl(self):
+        """Test that JSONL records are streamed, with generated ids and invalid lines skipped."""
+        path = self.write("dump.jsonl", "\n".join([
+            json.dumps({"id": "m1", "body": "first"}),
+            "not json",
+            json.dumps({"body": "second"}),
+            "",
+        ]))
+        self.assertEqual(list(es.iter_source(path)), [("m1", "first"), (f"{path}#3", "second")])
+        self.assertEqual(list(es.iter_jsonl(path, with_labels=True)), [("m1", "first", None), (f"{path}#3", "second", None)])
+
+    def test_packed(self):
+        """Test that packed corpus files are read record by record, with labels on request."""
+        path = os.path.join(self.directory, "corpus-00000.pack")
+        with open(path, 'wb') as file:
+            file.write(es.PACK_MAGIC)
+            for email_id, label, body in ((b"a_1", 0, "Sounds good"), (b"b_2", es.PACK_NO_LABEL, "Maybe")):
+                data = body.encode('utf-8')
+                file.write(es.PACK_RECORD.pack(len(email_id), label, len(data)) + email_id + data)
+        self.assertEqual(list(es.iter_source(path)), [("a_1", "Sounds good"), ("b_2", "Maybe")])
+        self.assertEqual(list(es.iter_packed(path, with_labels=True)),
+                         [("a_1", "Sounds good", "interested"), ("b_2", "Maybe", None)])
+
+    def test_corpus_directory(self):
+        """Test that a directory of corpus shards is read shard by shard in name order, after its message files."""
+        self.write("corpus/corpus-00001.jsonl", json.dumps({"id": "c", "body": "third", "label": "neutral"}) + "\n")
+        self.write("corpus/corpus-00000.jsonl", json.dumps({"id": "b", "body": "second", "label": "interested"}) + "\n")
+        self.write("corpus/a.txt", "first")
+        directory = os.path.join(self.directory, "corpus")
+        self.assertEqual([email_id for email_id, _ in es.iter_source(directory)],
+                         [os.path.join(directory, "a.txt"), "b", "c"])
+        self.assertEqual(list(es.iter_corpus(directory, with_labels=True)),
+                         [("b", "second", "interested"), ("c", "third", "neutral")])
+        self.assertIsNone(es.iter_source_files(directory))
+
+    def test_unsupported_source(self):
+        """Test that an unknown file type is rejected."""
+        path = self.write("data.csv", "a,b")
+        with self.assertRaises(ValueError):
+            es.iter_source(path)
+
+if __name__ == '__main__':
+    unittest.main()
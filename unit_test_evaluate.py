@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+import numpy as np
+import evaluate
+import sentiment as sa
+
+def fake_model(texts, **kwargs):
+    return [{"label": "NEGATIVE", "score": 0.8} if "vendor" in text else
+            {"label": "POSITIVE", "score": 0.9 if "deck" in text else 0.5} for text in texts]
+
+class TestEvaluate(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def test_label_from_filename(self):
+        """Test both the underscore and the older space spelling of poc_data file names."""
+        self.assertEqual(evaluate.label_from_filename("test_emails/not_interested_3.txt"), "not interested")
+        self.assertEqual(evaluate.label_from_filename("test_emails/not interested_3.txt"), "not interested")
+        self.assertEqual(evaluate.label_from_filename("/x/interested_1.txt"), "interested")
+        self.assertEqual(evaluate.label_from_filename("/x/neutral_12.txt"), "neutral")
+        self.assertIsNone(evaluate.label_from_filename("/x/reply.txt"))
+        with self.assertRaises(ValueError):
+            evaluate.normalize_label("maybe")
+
+    def test_collect_scores_with_labels_file(self):
+        """Test that labels file entries override file names and unlabeled emails are left out."""
+        self.write("interested_1.txt", "Please send the deck")
+        self.write("neutral_1.txt", "Please unsubscribe me.")
+        self.write("not_interested_1.txt", "We went with another vendor")
+        self.write("other.txt", "Nothing to go on")
+        labels = evaluate.load_labels(self.write("labels.csv", "id,label\nneutral_1.txt,not_interested\n"))
+        records = evaluate.iter_labeled(self.directory, labels)
+        model = MagicMock(side_effect=fake_model)
+        data = evaluate.collect_scores(records, model)
+        path = os.path.join(self.directory, "scores.npz")
+        evaluate.save_scores(path, data)
+        data = evaluate.load_scores(path)
+        order = np.argsort(data["ids"])
+        data = {name: values[order] for name, values in data.items()}
+        self.assertEqual([os.path.basename(i) for i in data["ids"]],
+                         ["interested_1.txt", "neutral_1.txt", "not_interested_1.txt"])
+        self.assertEqual(data["true"].tolist(), [evaluate.INTERESTED, evaluate.NOT_INTERESTED, evaluate.NOT_INTERESTED])
+        self.assertEqual(data["scores"][0], 0.9)
+        self.assertTrue(np.isnan(data["scores"][1]))
+        # NEGATIVE 0.8 is stored as P(POSITIVE), so thresholds below 0.5 can separate it
+        self.assertAlmostEqual(data["scores"][2], 0.2)
+        self.assertEqual(data["heuristic"].tolist(), [-1, evaluate.NOT_INTERESTED, -1])
+        self.assertEqual(data["phrases"].tolist(), ["", "unsubscribe", ""])
+        model.assert_called_once()
+
+    def test_confusion_grid_matches_score_to_label(self):
+        """Test that the vectorized grid agrees with score_to_label for every pair, including nt > it."""
+        rng = np.random.default_rng(0)
+        true = rng.integers(0, 3, 300)
+        scores = np.round(rng.random(300), 2)
+        heuristic = np.where(rng.random(300) < 0.2, rng.integers(0, 3, 300), -1)
+        scores[heuristic >= 0] = np.nan
+        thresholds = np.round(np.arange(0, 1.0001, 0.05), 10)
+        grid = evaluate.confusion_grid(true, scores, heuristic, thresholds, thresholds)
+        for j, nt in enumerate(thresholds):
+            for i, it in enumerate(thresholds):
+                expected = np.zeros((3, 3), dtype=np.int64)
+                for label, score, verdict in zip(true, scores, heuristic):
+                    predicted = verdict if verdict >= 0 else evaluate.CLASSES.index(sa.score_to_label(score, it, nt))
+                    expected[label, predicted] += 1
+                np.testing.assert_array_equal(grid[j, i], expected)
+
+    def test_sweep_finds_separating_thresholds(self):
+        """Test that the sweep picks thresholds that separate well-separated classes."""
+        data = {"true": np.array([0, 0, 1, 1, 2, 2]), "scores": np.array([0.95, 0.9, 0.6, 0.55, 0.2, np.nan]),
+                "heuristic": np.array([-1, -1, -1, -1, -1, 2])}
+        best = evaluate.sweep(data, step=0.05)
+        self.assertEqual(best["macro_f1"], 1.0)
+        self.assertTrue(0.2 < best["not_interested_threshold"] <= 0.55)
+        self.assertTrue(0.6 <= best["interested_threshold"] < 0.9)
+        current = evaluate.evaluate_thresholds(data, 0.3, 0.7)
+        self.assertEqual(current["confusion"], [[2, 0, 0], [0, 2, 0], [0, 0, 2]])
+        self.assertEqual(current["classes"]["neutral"]["support"], 2)
+
+    def test_classification_metrics_empty_classes(self):
+        """Test that classes with no predictions or no emails get zero scores instead of NaN."""
+        values = evaluate.classification_metrics(np.array([[3, 0, 0], [1, 0, 0], [0, 0, 0]]))
+        np.testing.assert_allclose(values["precision"], [0.75, 0, 0])
+        np.testing.assert_allclose(values["recall"], [1, 0, 0])
+        self.assertAlmostEqual(values["accuracy"], 0.75)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+from email_sources import iter_source
+from manifest import Manifest
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.mail = os.path.join(self.directory, "mail")
+        os.makedirs(self.mail)
+        self.path = os.path.join(self.directory, "cache", "manifest.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content, mtime=None):
+        path = os.path.join(self.mail, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def run_incremental(self, manifest):
+        processed = []
+        for email_id, content in manifest.filter(iter_source(self.mail, skip=manifest.is_unchanged), files=True):
+            processed.append(os.path.basename(email_id))
+            manifest.record({"id": email_id, "label": "neutral", "score": 0.5, "method": "model"})
+        manifest.checkpoint()
+        return sorted(processed)
+
+    def test_only_new_or_changed_files_are_processed(self):
+        """Test that a second run skips unchanged files and picks up new and modified ones."""
+        self.write("a.txt", "first", mtime=1000)
+        self.write("b.txt", "second", mtime=1000)
+        with Manifest(self.path) as manifest:
+            self.assertEqual(self.run_incremental(manifest), ["a.txt", "b.txt"])
+
+        self.write("b.txt", "second, edited", mtime=2000)
+        self.write("c.txt", "third", mtime=1000)
+        self.write("a.txt", "first", mtime=3000)  # touched, same content
+        with Manifest(self.path) as manifest:
+            self.assertEqual(self.run_incremental(manifest), ["b.txt", "c.txt"])
+            self.assertEqual(manifest.stats(), {"recorded": 2, "skipped": 1})
+
+        with Manifest(self.path) as manifest:
+            self.assertEqual(self.run_incremental(manifest), [])
+            self.assertEqual(manifest.stats(), {"recorded": 0, "skipped": 3})
+
+    def test_resume_after_interruption(self):
+        """Test that results checkpointed before a crash are not redone."""
+        for i in range(5):
+            self.write(f"{i}.txt", f"email {i}", mtime=1000)
+        manifest = Manifest(self.path, checkpoint_every=2)
+        records = manifest.filter(iter_source(self.mail, skip=manifest.is_unchanged), files=True)
+        done = []
+        for email_id, _ in records:
+            manifest.record({"id": email_id, "label": "neutral", "score": 0.5, "method": "model"})
+            done.append(os.path.basename(email_id))
+            if len(done) == 3:
+                break
+        manifest.connection.close()  # simulate a crash: no final checkpoint
+
+        with Manifest(self.path) as manifest:
+            remaining = self.run_incremental(manifest)
+        self.assertEqual(len(remaining), 3)
+        self.assertEqual(set(remaining) & set(done[:2]), set())
+
+    def test_repeated_ids(self):
+        """Test that a JSONL export repeating an id is recorded twice without a stat against the cwd."""
+        path = os.path.join(self.directory, "export.jsonl")
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('{"id": "x", "body": "first"}\n{"id": "x", "body": "second"}\n')
+        with Manifest(self.path) as manifest:
+            records = list(manifest.filter(iter_source(path)))
+            self.assertEqual(records, [("x", "first"), ("x", "second")])
+            for email_id, _ in records:
+                manifest.record({"id": email_id, "label": "neutral", "score": 0.5, "method": "model"})
+            self.assertEqual(manifest.in_flight, {})
+            row = manifest.connection.execute("SELECT size, mtime_ns FROM emails WHERE id = 'x'").fetchone()
+            self.assertEqual(row, (None, None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from metrics import Metrics
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def record_run(self, metrics):
+        metrics.observe("normalize", 0.5, 2)
+        metrics.observe("normalize", 1.5, 2)
+        metrics.record_batch(3)
+        metrics.record_result({"label": "not interested", "method": "heuristic", "phrase": "unsubscribe"})
+        metrics.record_result({"label": "interested", "method": "model", "phrase": None})
+        metrics.count("cache_hits", 4)
+
+    def test_summary(self):
+        """Test timers, counters and derived rates in the summary."""
+        self.record_run(self.metrics)
+        summary = self.metrics.summary()
+        self.assertEqual(summary["timers"]["normalize"], [2, 4, 2.0, 1.5])
+        self.assertEqual(summary["emails"], 2)
+        self.assertEqual(summary["heuristic_hit_rate"], 0.5)
+        self.assertEqual(summary["mean_batch_size"], 3)
+        self.assertEqual(summary["phrase_hits"], {"unsubscribe": 1})
+        self.assertIn("Heuristic hit rate: 50.0%", self.metrics.render_summary())
+
+    def test_merge(self):
+        """Test that a snapshot from another process adds to the totals."""
+        worker = Metrics()
+        self.record_run(worker)
+        self.record_run(self.metrics)
+        self.metrics.merge(worker.snapshot())
+        summary = self.metrics.summary()
+        self.assertEqual(summary["timers"]["normalize"], [4, 8, 4.0, 1.5])
+        self.assertEqual(summary["labels"], {"not interested": 2, "interested": 2})
+        self.assertEqual(summary["batch_sizes"], {3: 2})
+        self.assertEqual(summary["counters"]["cache_hits"], 8)
+
+    def test_render_prometheus(self):
+        """Test the Prometheus text format, including the batch size histogram and label escaping."""
+        self.record_run(self.metrics)
+        self.metrics.record_result({"label": "neutral", "method": "heuristic", "phrase": 'say "maybe"'})
+        text = self.metrics.render_prometheus()
+        self.assertIn("# TYPE email_sentiment_model_batch_size histogram", text)
+        self.assertIn('email_sentiment_model_batch_size_bucket{le="2"} 0', text)
+        self.assertIn('email_sentiment_model_batch_size_bucket{le="4"} 1', text)
+        self.assertIn('email_sentiment_model_batch_size_bucket{le="+Inf"} 1', text)
+        self.assertIn('email_sentiment_model_batch_size_sum 3', text)
+        self.assertIn('email_sentiment_stage_items_total{stage="normalize"} 4', text)
+        self.assertIn('email_sentiment_cache_lookups_total{outcome="hit"} 4', text)
+        self.assertIn('phrase="say \\"maybe\\""', text)
+        # Each family has one label set, so summing a family counts every email once
+        self.assertIn('email_sentiment_emails_by_method_total{method="heuristic"}', text)
+        self.assertIn('email_sentiment_emails_by_label_total{label="neutral"}', text)
+        self.assertNotIn("email_sentiment_emails_total", text)
+        self.assertTrue(text.endswith("\n"))
+
+if __name__ == '__main__':
+    unittest.main()
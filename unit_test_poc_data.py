@@ -1,6 +1,12 @@
+import json
+import os
+import random
+import shutil
+import tempfile
 import unittest
 from unittest.mock import patch, mock_open, MagicMock
 import poc_data as pd
+from email_sources import iter_packed, iter_source
 
 class TestPOCData(unittest.TestCase):
 
@@ -31,7 +37,7 @@ class TestPOCData(unittest.TestCase):
     def test_handle_existing_directory_add(self, mocked_input):
         """Test handle_existing_directory to add more emails."""
         mocked_input.return_value = '2'
-        with patch('os.listdir', return_value=['interested_1.txt', 'neutral_1.txt', 'not interested_1.txt']):
+        with patch('os.listdir', return_value=['interested_1.txt', 'neutral_1.txt', 'not_interested_1.txt']):
             pd.handle_existing_directory()
             self.assertEqual(pd.email_categories['interested'], 9)
             self.assertEqual(pd.email_categories['neutral'], 9)
@@ -41,7 +47,7 @@ class TestPOCData(unittest.TestCase):
     def test_handle_existing_directory_replace(self, mocked_input):
         """Test handle_existing_directory to replace current emails."""
         mocked_input.return_value = '3'
-        with patch('os.listdir', return_value=['interested_1.txt', 'neutral_1.txt', 'not interested_1.txt']), \
+        with patch('os.listdir', return_value=['interested_1.txt', 'neutral_1.txt', 'not_interested_1.txt']), \
              patch('os.remove') as mock_remove:
             pd.handle_existing_directory()
             self.assertEqual(mock_remove.call_count, 3)
@@ -66,10 +72,61 @@ class TestPOCData(unittest.TestCase):
         pd.email_categories = {'interested': 9, 'neutral': 9, 'not interested': 9}
         total_files = sum(pd.email_categories.values())
         mock_file_open.side_effect = [None if i < total_files - 1 else IOError("File creation error") for i in range(total_files)]
-        pd.create_test_emails()
+        pd.create_test_emails(choice='1')
         # Expect error on the last file to be created
-        expected_error_file = f"test_emails/not interested_{pd.email_categories['not interested']}.txt"
+        expected_error_file = f"test_emails/not_interested_{pd.email_categories['not interested']}.txt"
         mock_print.assert_called_with(f"Error generating file {expected_error_file}: File creation error")
 
+    def test_handle_existing_directory_without_prompt(self):
+        """Test that passing a choice skips the interactive prompt."""
+        with patch('poc_data.input', create=True) as mocked_input, \
+             patch('os.listdir', return_value=['interested_1.txt']):
+            pd.handle_existing_directory('2')
+            mocked_input.assert_not_called()
+        self.assertEqual(pd.email_categories['interested'], 9)
+
+    def test_generate_realistic_email(self):
+        """Test that realistic emails mix in URLs, signatures and quoted replies on request."""
+        rng = random.Random(1)
+        plain = pd.generate_realistic_email("interested", rng, url_rate=0, signature_rate=0, quoted_rate=0)
+        self.assertNotIn("http", plain)
+        self.assertNotIn("wrote:", plain)
+        noisy = pd.generate_realistic_email("interested", rng, url_rate=1, signature_rate=1, quoted_rate=1)
+        self.assertIn("http", noisy)
+        self.assertIn("\n--\n", noisy)
+        self.assertIn("wrote:\n> ", noisy)
+        lengths = [pd.generate_realistic_email("neutral", rng, mean_sentences=4, url_rate=0, signature_rate=0,
+                                               quoted_rate=0).count("\n\n") for _ in range(50)]
+        self.assertGreater(max(lengths), 3)
+        # mean_sentences is the mean of the body length, not its median; greeting and sign-off add one break
+        sentences = [pd.generate_realistic_email("neutral", rng, mean_sentences=4, url_rate=0, signature_rate=0,
+                                                 quoted_rate=0).count("\n\n") - 1 for _ in range(4000)]
+        self.assertAlmostEqual(sum(sentences) / len(sentences), 4, delta=0.25)
+
+    def test_generate_corpus_formats_are_deterministic(self):
+        """Test that every format holds the same labeled emails for a seed, whatever the worker count."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.assertEqual(pd.generate_corpus(os.path.join(directory, "jsonl"), 25, seed=7, fmt="jsonl",
+                                            shard_size=10), 25)
+        pd.generate_corpus(os.path.join(directory, "pack"), 25, seed=7, workers=2, fmt="pack", shard_size=10)
+        pd.generate_corpus(os.path.join(directory, "files"), 25, seed=7, fmt="files", shard_size=10)
+
+        jsonl = []
+        for name in sorted(os.listdir(os.path.join(directory, "jsonl"))):
+            with open(os.path.join(directory, "jsonl", name), encoding='utf-8') as file:
+                jsonl.extend((r["id"], r["body"], r["label"]) for r in map(json.loads, file))
+        packed = []
+        for name in sorted(os.listdir(os.path.join(directory, "pack"))):
+            packed.extend(iter_packed(os.path.join(directory, "pack", name), with_labels=True))
+        self.assertEqual(len(jsonl), 25)
+        self.assertEqual(jsonl, packed)
+        self.assertEqual(list(iter_source(os.path.join(directory, "pack"))), [record[:2] for record in packed])
+
+        files = sorted(os.listdir(os.path.join(directory, "files")))
+        self.assertEqual(sorted(f"{email_id}.txt" for email_id, _, _ in jsonl), files)
+        self.assertFalse(any(' ' in name for name in files))
+        self.assertTrue(all(email_id.startswith(pd.file_label(label)) for email_id, _, label in jsonl))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+from score_cache import ScoreCache
+
+class TestScoreCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cache", "scores.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def open_cache(self, model_name="model-a", interested=0.7, not_interested=0.3, max_entries=100):
+        return ScoreCache(self.path, model_name, interested, not_interested, max_entries)
+
+    def test_get_put_and_counters(self):
+        """Test that stored results are returned and hits/misses are counted."""
+        with self.open_cache() as cache:
+            self.assertIsNone(cache.get("hello there"))
+            cache.put("hello there", "interested", 0.9)
+            self.assertEqual(cache.get("hello there"), ("interested", 0.9))
+            self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "entries": 1, "hit_rate": 0.5})
+
+    def test_persists_across_instances(self):
+        """Test that results survive reopening the cache with the same model and thresholds."""
+        with self.open_cache() as cache:
+            cache.put_many([("one", "neutral", 0.5), ("two", "not interested", 0.1)])
+        with self.open_cache() as cache:
+            self.assertEqual(cache.get_many(["one", "two", "three"]),
+                             {"one": ("neutral", 0.5), "two": ("not interested", 0.1)})
+            self.assertEqual(cache.stats()["entries"], 2)
+
+    def test_invalidated_when_model_or_thresholds_change(self):
+        """Test that changing the model name or a threshold drops stored results."""
+        with self.open_cache() as cache:
+            cache.put("text", "interested", 0.8)
+        with self.open_cache(interested=0.75) as cache:
+            self.assertIsNone(cache.get("text"))
+            cache.put("text", "interested", 0.8)
+        with self.open_cache(model_name="model-b", interested=0.75) as cache:
+            self.assertIsNone(cache.get("text"))
+            self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entries are evicted beyond max_entries."""
+        with self.open_cache(max_entries=2) as cache:
+            cache.put("a", "neutral", 0.5)
+            cache.put("b", "neutral", 0.5)
+            cache.get("a")
+            cache.put("c", "neutral", 0.5)
+            self.assertEqual(set(cache.get_many(["a", "b", "c"])), {"a", "c"})
+            self.assertEqual(cache.stats()["entries"], 2)
+
+    def test_max_entries_shared_across_connections(self):
+        """Test that caches sharing a file, like parallel workers, keep the total under max_entries."""
+        with self.open_cache(max_entries=3) as first, self.open_cache(max_entries=3) as second:
+            first.put_many([("a", "neutral", 0.5), ("b", "neutral", 0.5)])
+            second.put_many([("c", "neutral", 0.5), ("d", "neutral", 0.5)])
+            first.put_many([("e", "neutral", 0.5)])
+            self.assertEqual(set(second.get_many(list("abcde"))), {"c", "d", "e"})
+            self.assertEqual(first.stats()["entries"], 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,46 @@
 import unittest
 from unittest.mock import patch, mock_open, MagicMock
 import sentiment as sa
+import glob
 import io
+import os
+import re
+import shutil
+import sqlite3
 import sys
+import tempfile
+import logging.handlers
+from concurrent.futures import ThreadPoolExecutor
+from dedup import NearDuplicateIndex
+from metrics import metrics
+
+
+def legacy_normalize_text(text):
+    """The original normalize_text implementation, kept as the parity reference."""
+    text = re.sub(r'http\S+', '', text)
+    text = re.sub(r'\S*@\S*\s?', '', text)
+    text = re.sub(r'[^A-Za-z0-9]+', ' ', text)
+    common_signatures = ["regards", "cheers", "sincerely", "thanks", "thank you"]
+    for signature in common_signatures:
+        text = re.split(signature, text, flags=re.IGNORECASE)[0]
+    return text.strip()
+
+
+PARITY_TEXTS = [
+    "",
+    "   \n\n  ",
+    "Check out this link: http://example.com\nContact: test@example.com",
+    "Hi there,\n\nThanks!\n\nBest regards,\nJohn Doe",
+    "Special characters & symbols should be removed!",
+    "We will review it.\nThank\nyou for writing.\nSINCERELY, Jane",
+    "Line one!!!\n\n!!!Line two\n(see https://x.io/a?b=c) and mail bob@corp.com\nnext line",
+    "Reach me at a@b\nc or x@y.z, then cheers",
+    "Our regardsless typo and thanksgiving plans",
+    "Nothing to strip here",
+    "Trailing whitespace mail@example.com \n",
+    "Kind Regards\nSomeone\nThanks again",
+    "We'd like to see a demo -- thank-you!",
+]
 
 class TestSentimentAnalysis(unittest.TestCase):
 
@@ -24,6 +62,51 @@ class TestSentimentAnalysis(unittest.TestCase):
         for text, expected in test_texts.items():
             self.assertEqual(sa.normalize_text(text), expected)
 
+    def test_normalize_text_parity(self):
+        """Test that normalize_text matches the original implementation on edge cases and the test corpus."""
+        texts = list(PARITY_TEXTS)
+        for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_emails', '*.txt'))):
+            with open(path, 'r', encoding='utf-8') as file:
+                texts.append(file.read())
+        for text in texts:
+            self.assertEqual(sa.normalize_text(text), legacy_normalize_text(text), repr(text))
+
+    def test_normalize_stream_parity(self):
+        """Test that normalize_stream over lines matches normalize_text when there is no quoted history."""
+        for text in PARITY_TEXTS:
+            self.assertEqual(sa.normalize_stream(io.StringIO(text), stop_at_quoted=False),
+                             sa.normalize_text(text), repr(text))
+
+    def test_normalize_stream_stops_early(self):
+        """Test that normalize_stream stops at quoted replies and signatures without reading further."""
+        body = "Sounds good, send the contract.\n\nOn Mon, Jan 1, 2024, Sales wrote:\n> Hi, are you interested?\n"
+        self.assertEqual(sa.normalize_stream(io.StringIO(body)), "Sounds good send the contract")
+        self.assertEqual(sa.normalize_stream(io.StringIO("Fine by me\n> quoted\n")), "Fine by me")
+        self.assertEqual(sa.normalize_stream(io.StringIO("Ok\n-----Original Message-----\nFrom: x\n")), "Ok")
+
+        def lines():
+            yield "Let's talk next week.\n"
+            yield "Regards,\n"
+            raise AssertionError("read past the signature")
+        self.assertEqual(sa.normalize_stream(lines()), "Let s talk next week")
+
+    def test_process_emails_stream(self):
+        """Test that stream mode normalizes files while reading them, in every processing mode."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(os.path.join(directory, "a.txt"), 'w', encoding='utf-8') as file:
+            file.write("Send the contract.\n\nOn Mon, Sales wrote:\n> Are you interested? Unsubscribe here.\n")
+        with open(os.path.join(directory, "b.eml"), 'w', encoding='utf-8') as file:
+            file.write("Subject: Re: Offer\n\nLooks promising\n> old thread\n")
+        self.assertEqual(sorted(sa.iter_normalized(directory)),
+                         [(os.path.join(directory, "a.txt"), "Send the contract"),
+                          (os.path.join(directory, "b.eml"), "Looks promising")])
+        for pipelined in (False, True):
+            model = MagicMock(side_effect=lambda texts, **kwargs: [{"label": "POSITIVE", "score": 0.9} for t in texts])
+            sa.process_emails(directory, model, pipelined=pipelined, quiet=True, stream=True)
+            texts = [text for call in model.call_args_list for text in call[0][0]]
+            self.assertEqual(sorted(texts), ["Looks promising", "Send the contract"])
+
     def test_heuristic_check_various_cases(self):
         """Test the heuristic_check function for various cases."""
         test_cases = {
@@ -36,39 +119,321 @@ class TestSentimentAnalysis(unittest.TestCase):
         for text, expected in test_cases.items():
             self.assertEqual(sa.heuristic_check(text), expected)
 
+    def test_heuristic_check_word_boundaries(self):
+        """Test that short phrases only match whole words."""
+        test_cases = {
+            "I know we spoke now and then about another idea.": None,
+            "No, we will pass.": "not interested",
+            "The answer is no": "not interested",
+            "Not sure yet": "neutral",
+        }
+        for text, expected in test_cases.items():
+            self.assertEqual(sa.heuristic_check(text), expected)
+
+    def test_heuristic_check_priority(self):
+        """Test that not interested outranks interested, which outranks neutral."""
+        self.assertEqual(sa.heuristic_check("Possibly, it sounds great, but unsubscribe me"), "not interested")
+        self.assertEqual(sa.heuristic_check("Maybe later, though it sounds great"), "interested")
+
+    def test_heuristic_match_reports_phrase(self):
+        """Test that heuristic_match reports the phrase, including on normalized punctuation."""
+        self.assertEqual(sa.heuristic_match(sa.normalize_text("I'll think about it.")),
+                         ("neutral", "I'll think about it"))
+        self.assertEqual(sa.heuristic_match("NO THANKS"), ("not interested", "no thanks"))
+        self.assertIsNone(sa.heuristic_match("Nothing to report"))
+
+    def test_phrase_matcher_custom_sets(self):
+        """Test a PhraseMatcher built from configurable phrase sets."""
+        matcher = sa.PhraseMatcher([("not interested", ["remove me"]), ("interested", ["book a call"])])
+        self.assertEqual(sa.heuristic_check("Please book a call, or remove me", matcher), "not interested")
+        self.assertEqual(sa.heuristic_check("Please book a call", matcher), "interested")
+        self.assertIsNone(sa.heuristic_check("No thanks", matcher))
+
+    def test_phrase_matcher_overlapping_phrases(self):
+        """Test that a lower-priority phrase starting earlier does not hide an overlapping higher-priority one."""
+        matcher = sa.PhraseMatcher([("not interested", ["not interested"]), ("neutral", ["am not"])])
+        self.assertEqual(matcher.match("I am not interested"), ("not interested", "not interested"))
+        self.assertEqual(matcher.match("I am not sure"), ("neutral", "am not"))
+        self.assertIsNone(sa.PhraseMatcher([]).match("anything"))
+
+    def test_classify_batch_preserves_order(self):
+        """Test that classify_batch sorts by length for batching but returns results in input order."""
+        model = MagicMock(side_effect=lambda texts, **kwargs: [{"label": "POSITIVE", "score": len(t)} for t in texts])
+        texts = ["a much longer email body here", "short", "medium length text"]
+        results = sa.classify_batch(model, texts, batch_size=2)
+        self.assertEqual([r["score"] for r in results], [len(t) for t in texts])
+        self.assertEqual(model.call_count, 2)
+        self.assertEqual(model.call_args_list[0][0][0], ["short", "medium length text"])
+
+    def test_score_emails_batches_model_calls(self):
+        """Test that score_emails batches model calls and yields results in record order."""
+        model = MagicMock(side_effect=lambda texts, **kwargs: [{"label": "POSITIVE", "score": 0.9} for t in texts])
+        records = [
+            ("a.txt", "The proposal looks promising overall."),
+            ("b.txt", "Please unsubscribe me."),
+            ("c.txt", "Could we talk this Tuesday?"),
+        ]
+        results = list(sa.score_emails(records, model, batch_size=8))
+        self.assertEqual([r["id"] for r in results], ["a.txt", "b.txt", "c.txt"])
+        self.assertEqual([r["label"] for r in results], ["interested", "not interested", "interested"])
+        self.assertEqual(results[1]["method"], "heuristic")
+        model.assert_called_once()
+
+    def test_score_emails_model_error_skips_batch(self):
+        """Test that a failing model batch is logged and skipped without stopping heuristic results."""
+        model = MagicMock(side_effect=RuntimeError("Model error"))
+        records = [("a.txt", "The proposal looks promising overall."), ("b.txt", "Please unsubscribe me.")]
+        results = list(sa.score_emails(records, model))
+        self.assertEqual([r["id"] for r in results], ["b.txt"])
+
+
+    def test_score_emails_uses_cache(self):
+        """Test that cached texts skip the model and new model results are stored."""
+        model = MagicMock(side_effect=lambda texts, **kwargs: [{"label": "POSITIVE", "score": 0.9} for t in texts])
+        cache = MagicMock()
+        cache.get_many.return_value = {"Looks promising": ("neutral", 0.5)}
+        records = [("a.txt", "Looks promising"), ("b.txt", "Send the contract")]
+        results = list(sa.score_emails(records, model, cache=cache))
+        self.assertEqual([(r["method"], r["label"]) for r in results], [("cache", "neutral"), ("model", "interested")])
+        model.assert_called_once_with(["Send the contract"], batch_size=1, truncation=True)
+        cache.put_many.assert_called_once_with([("Send the contract", "interested", 0.9)])
+
+    def test_score_emails_cache_locked(self):
+        """Test that a locked cache database is logged and the window is still scored."""
+        model = MagicMock(side_effect=lambda texts, **kwargs: [{"label": "POSITIVE", "score": 0.9} for t in texts])
+        cache = MagicMock()
+        cache.get_many.side_effect = cache.put_many.side_effect = sqlite3.OperationalError("database is locked")
+        records = [("a.txt", "Looks promising"), ("b.txt", "Send the contract")]
+        with self.assertLogs(level="WARNING"):
+            results = list(sa.score_emails(records, model, cache=cache))
+        self.assertEqual([(r["method"], r["label"]) for r in results], [("model", "interested")] * 2)
+
+    def test_score_window_sorts_whole_window_by_length(self):
+        """Test that model batches are length-homogeneous across the window, not just within a batch."""
+        lengths = []
+        def model(texts, **kwargs):
+            lengths.append([len(text.split()) for text in texts])
+            return [{"label": "POSITIVE", "score": 0.9} for _ in texts]
+        records = [(f"{i}.txt", "Maybe" if i % 2 else " ".join(["word"] * 50)) for i in range(8)]
+        results = list(sa.score_emails(records, model, batch_size=4, window=8))
+        self.assertEqual(lengths, [[1, 1, 1, 1], [50, 50, 50, 50]])
+        self.assertEqual([r["id"] for r in results], [f"{i}.txt" for i in range(8)])
+
+    def test_score_emails_dedup(self):
+        """Test that near-duplicates reuse their representative's result across windows, with a link."""
+        model = MagicMock(side_effect=lambda texts, **kwargs: [{"label": "POSITIVE", "score": 0.9} for t in texts])
+        body = ("we have reviewed your proposal and would like to schedule a call next week "
+                "to go over pricing and the onboarding timeline for our team")
+        records = [("a.txt", f"Hi John, {body}"), ("b.txt", f"Hello Maria, {body}"), ("c.txt", "Send the contract"),
+                   ("d.txt", f"Dear Sam, {body}")]
+        results = list(sa.score_emails(records, model, window=2, dedup=NearDuplicateIndex(0.7)))
+        self.assertEqual([r["method"] for r in results], ["model", "duplicate", "model", "duplicate"])
+        self.assertEqual([r["duplicate_of"] for r in results], [None, "a.txt", None, "a.txt"])
+        self.assertEqual(results[1]["label"], "interested")
+        self.assertEqual(results[3]["score"], 0.9)
+        self.assertEqual(model.call_count, 2)
+
+    def test_score_window_dedup_failed_representative(self):
+        """Test that members of a cluster whose representative failed are dropped and the cluster is forgotten."""
+        dedup = NearDuplicateIndex(0.7)
+        body = "we would like to schedule a call next week to go over pricing and the onboarding timeline"
+        pending = [sa.prepare_email("a.txt", f"Hi John, {body}"), sa.prepare_email("b.txt", f"Hello Maria, {body}")]
+        self.assertEqual(sa.score_window(pending, MagicMock(side_effect=RuntimeError("boom")), dedup=dedup), [])
+        self.assertEqual(dedup.stats()["entries"], 0)
+
+    def test_score_to_label(self):
+        """Test the threshold mapping from model score to label."""
+        self.assertEqual(sa.score_to_label(0.9), "interested")
+        self.assertEqual(sa.score_to_label(0.5), "neutral")
+        self.assertEqual(sa.score_to_label(0.1), "not interested")
+        self.assertEqual(sa.score_to_label(0.5, 0.4, 0.2), "interested")
+
+    def test_score_emails_uses_positive_probability(self):
+        """Test that NEGATIVE outputs are folded to the probability of POSITIVE before thresholding."""
+        model = MagicMock(side_effect=lambda texts, **kwargs: [
+            {"label": "NEGATIVE", "score": 0.9} if "vendor" in text else {"label": "POSITIVE", "score": 0.51}
+            for text in texts])
+        records = [("a.txt", "We went with another vendor"), ("b.txt", "Looks promising")]
+        results = list(sa.score_emails(records, model))
+        self.assertEqual([r["label"] for r in results], ["not interested", "neutral"])
+        self.assertAlmostEqual(results[0]["score"], 0.1)
+        self.assertEqual(sa.positive_score({"label": "NEGATIVE", "score": 0.51}), 0.49)
+
     @patch('sentiment.load_model')
-    @patch('glob.glob')
-    def test_process_emails_normal_case(self, mock_glob, mock_load_model):
+    def test_score_emails_parallel_preserves_order(self, mock_load_model):
+        """Test that sharded parallel scoring loads one model per worker and yields results in order."""
+        mock_load_model.return_value = MagicMock(
+            side_effect=lambda texts, **kwargs: [{"label": "POSITIVE", "score": 0.9} for t in texts])
+        records = [(f"{i}.txt", f"Email body number {i}") for i in range(50)]
+
+        def thread_pool(workers, mp_context=None, initializer=None, initargs=()):
+            return ThreadPoolExecutor(workers, initializer=initializer, initargs=initargs)
+
+        with patch('sentiment.ProcessPoolExecutor', side_effect=thread_pool):
+            results = list(sa.score_emails_parallel(records, workers=2, threads_per_worker=1, shard_size=7))
+        self.assertEqual([r["id"] for r in results], [email_id for email_id, _ in records])
+        self.assertTrue(all(r["label"] == "interested" for r in results))
+        self.assertLessEqual(mock_load_model.call_count, 2)
+
+    def test_score_emails_pipelined(self):
+        """Test that the staged pipeline yields every email in source order and reports each stage."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for i in range(40):
+            with open(os.path.join(directory, f"{i:02d}.txt"), 'w', encoding='utf-8') as file:
+                file.write("Please unsubscribe me." if i % 4 == 0 else f"Email body number {i}")
+        model = MagicMock(side_effect=lambda texts, **kwargs: [{"label": "POSITIVE", "score": 0.9} for t in texts])
+        stage_stats = []
+        with patch('sentiment.iter_source_files',
+                   side_effect=lambda source, skip: ((path, False) for path in sorted(
+                       os.path.join(directory, name) for name in os.listdir(directory)))):
+            results = list(sa.score_emails_pipelined(directory, model, batch_size=8, read_workers=3, queue_size=4,
+                                                     stage_stats=stage_stats))
+        self.assertEqual([os.path.basename(r["id"]) for r in results], [f"{i:02d}.txt" for i in range(40)])
+        self.assertEqual([r["label"] for r in results[:2]], ["not interested", "interested"])
+        self.assertEqual([stats.name for stats in stage_stats], ["read", "prepare", "inference"])
+        self.assertTrue(all(stats.summary()["items"] == 40 for stats in stage_stats))
+        self.assertIn("inference", sa.format_stage_report(stage_stats))
+
+    @patch('sentiment.iter_source')
+    def test_score_emails_pipelined_sequential_source_error(self, mock_iter_source):
+        """Test that a failing read in a sequential source is raised to the consumer."""
+        def records():
+            yield "m1", "First email"
+            raise OSError("Truncated mbox")
+        mock_iter_source.return_value = records()
+        model = MagicMock(side_effect=lambda texts, **kwargs: [{"label": "POSITIVE", "score": 0.9} for t in texts])
+        with self.assertRaises(OSError):
+            list(sa.score_emails_pipelined("export.mbox", model))
+
+    def test_load_model_backends_offline(self):
+        """Test that the pytorch and int8 backends load from a local directory and agree on labels."""
+        from transformers import DistilBertConfig, DistilBertForSequenceClassification, DistilBertTokenizer
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + "we are interested not in this offer".split()
+        with open(os.path.join(directory, "vocab.txt"), 'w', encoding='utf-8') as file:
+            file.write("\n".join(vocab))
+        DistilBertTokenizer(os.path.join(directory, "vocab.txt")).save_pretrained(directory)
+        config = DistilBertConfig(vocab_size=len(vocab), dim=16, hidden_dim=32, n_layers=1, n_heads=2,
+                                  max_position_embeddings=64, id2label={0: "NEGATIVE", 1: "POSITIVE"},
+                                  label2id={"NEGATIVE": 0, "POSITIVE": 1})
+        DistilBertForSequenceClassification(config).save_pretrained(directory)
+
+        texts = ["we are interested", "not in this offer"]
+        eager = sa.classify_batch(sa.load_model("pytorch", directory), texts)
+        quantized = sa.classify_batch(sa.load_model("int8", directory), texts)
+        for full, int8 in zip(eager, quantized):
+            self.assertAlmostEqual(full["score"], int8["score"], places=2)
+
+    def test_load_model_rejects_unknown_backend(self):
+        """Test that an unknown backend is rejected before anything is loaded."""
+        with self.assertRaises(ValueError):
+            sa.load_model("tensorrt")
+
+    @patch('sentiment.AutoTokenizer')
+    def test_load_model_onnx_requires_optimum(self, mock_tokenizer):
+        """Test that the onnx backend explains how to install its optional dependency."""
+        with patch.dict(sys.modules, {"optimum.onnxruntime": None}):
+            with self.assertRaises(ImportError) as context:
+                sa.load_model("onnx", "/models/local")
+        self.assertIn("optimum[onnxruntime]", str(context.exception))
+        mock_tokenizer.from_pretrained.assert_called_once_with("/models/local", local_files_only=True)
+
+    @patch('sentiment.load_model')
+    @patch('sentiment.iter_source')
+    def test_process_emails_normal_case(self, mock_iter_source, mock_load_model):
         """Test the process_emails function for normal case."""
-        mock_glob.return_value = ['/path/to/test_email.txt']
+        mock_iter_source.return_value = iter([('/path/to/test_email.txt', "This is a test email content.")])
         mock_load_model.return_value = MagicMock(return_value=[{"label": "NEGATIVE", "score": 0.1}])
 
-        with patch('builtins.open', new_callable=mock_open, read_data="This is a test email content."):
-            sa.process_emails("dummy_directory", mock_load_model())
-            mock_load_model.assert_called()
+        sa.process_emails("dummy_directory", mock_load_model())
+        mock_load_model.assert_called()
+        mock_iter_source.assert_called_once_with("dummy_directory", skip=None)
 
     @patch('sentiment.load_model')
-    @patch('glob.glob')
-    def test_process_emails_file_reading_error(self, mock_glob, mock_load_model):
+    @patch('os.scandir')
+    def test_process_emails_file_reading_error(self, mock_scandir, mock_load_model):
         """Test the process_emails function when file reading fails."""
-        mock_glob.return_value = ['/path/to/test_email.txt']
+        entry = MagicMock(path='/path/to/test_email.txt')
+        entry.name = 'test_email.txt'
+        mock_scandir.return_value.__enter__.return_value = iter([entry])
         mock_load_model.return_value = MagicMock(return_value=[{"label": "NEGATIVE", "score": 0.1}])
 
-        with patch('builtins.open', mock_open()) as mock_file:
+        with patch('os.path.isdir', side_effect=lambda path: path == "dummy_directory"), \
+             patch('builtins.open', mock_open()) as mock_file:
             mock_file.side_effect = OSError("File not found")
             with self.assertRaises(OSError):
                 sa.process_emails("dummy_directory", mock_load_model())
 
+    @patch('sentiment.iter_source')
+    def test_process_emails_incremental(self, mock_iter_source):
+        """Test that process_emails filters through the manifest, records results and checkpoints."""
+        mock_iter_source.return_value = iter([('a.txt', "Please unsubscribe me.")])
+        manifest = MagicMock()
+        manifest.filter.side_effect = lambda records, files: records
+        sa.process_emails("dummy_directory", MagicMock(), manifest=manifest)
+        mock_iter_source.assert_called_once_with("dummy_directory", skip=manifest.is_unchanged)
+        self.assertEqual(manifest.record.call_args[0][0]["id"], 'a.txt')
+        manifest.checkpoint.assert_called_once()
+
+    @patch('sentiment.iter_source')
+    def test_process_emails_records_metrics(self, mock_iter_source):
+        """Test that process_emails records per-email metrics and prints nothing when quiet."""
+        mock_iter_source.return_value = iter([('a.txt', "Please unsubscribe me."), ('b.txt', "Send the deck"),
+                                              ('c.txt', "Send the pricing")])
+        model = MagicMock(side_effect=lambda texts, **kwargs: [{"label": "POSITIVE", "score": 0.9} for _ in texts])
+        metrics.reset()
+        sa.process_emails("dummy_directory", model, quiet=True)
+        summary = metrics.summary()
+        self.assertEqual(sys.stdout.getvalue(), "")
+        self.assertEqual(summary["labels"], {"not interested": 1, "interested": 2})
+        self.assertEqual(summary["phrase_hits"], {"unsubscribe": 1})
+        self.assertEqual(summary["counters"]["model_calls"], 1)
+        self.assertEqual(summary["batch_sizes"], {2: 1})
+        self.assertEqual(summary["timers"]["normalize"][1], 3)
+
+    def test_configure_logging_uses_queue(self):
+        """Test that configure_logging writes through a background listener at the chosen level."""
+        root = logging.getLogger()
+        handlers, level = root.handlers[:], root.level
+        directory = tempfile.mkdtemp()
+        try:
+            listener = sa.configure_logging(logging.INFO, directory)
+            self.assertIsInstance(root.handlers[0], logging.handlers.QueueHandler)
+            # Records are queued unformatted; the listener thread formats them
+            record = logging.LogRecord("root", logging.INFO, __file__, 1, "count %d", (3,), None)
+            prepared = root.handlers[0].prepare(record)
+            self.assertEqual((prepared.msg, prepared.args), ("count %d", (3,)))
+            logging.debug("hidden detail")
+            logging.info("visible summary %d", 42)
+            try:
+                raise RuntimeError("boom")
+            except RuntimeError:
+                logging.error("failed batch", exc_info=True)
+            listener.stop()
+            with open(os.path.join(directory, "analysis.log")) as f:
+                log = f.read()
+            self.assertIn("visible summary 42", log)
+            self.assertIn("RuntimeError: boom", log)
+            self.assertNotIn("hidden detail", log)
+        finally:
+            for handler in root.handlers[:]:
+                root.removeHandler(handler)
+                handler.close()
+            root.handlers[:], sa.log_listener = handlers, None
+            root.setLevel(level)
+            shutil.rmtree(directory)
+
     @patch('transformers.pipeline')
-    @patch('glob.glob')
-    def test_process_emails_model_error(self, mock_glob, mock_pipeline):
+    @patch('sentiment.iter_source')
+    def test_process_emails_model_error(self, mock_iter_source, mock_pipeline):
         """Test the process_emails function when model analysis fails."""
-        mock_glob.return_value = ['/path/to/test_email.txt']
+        mock_iter_source.return_value = iter([('/path/to/test_email.txt', "Email content")])
         mock_pipeline.side_effect = Exception("Model error")
 
-        with patch('builtins.open', new_callable=mock_open, read_data="Email content"):
-            with self.assertRaises(Exception):
-                sa.process_emails("dummy_directory", mock_pipeline())
+        with self.assertRaises(Exception):
+            sa.process_emails("dummy_directory", mock_pipeline())
 
 if __name__ == '__main__':
     unittest.main()
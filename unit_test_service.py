@@ -0,0 +1,96 @@
+import asyncio
+import json
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+import service
+import sentiment as sa
+from metrics import metrics
+
+def fake_model(texts, **kwargs):
+    return [{"label": "POSITIVE", "score": 0.9} for _ in texts]
+
+class TestScoringService(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.model = MagicMock(side_effect=fake_model)
+        self.service = service.ScoringService(self.model, max_batch_size=8, max_wait_ms=50)
+        self.server = await self.service.start("127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        await self.service.stop()
+
+    async def request(self, method, path, payload=None):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode('latin-1') + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(body) if b'application/json' in head else body.decode('utf-8')
+
+    async def test_concurrent_requests_share_a_batch(self):
+        """Test that emails from concurrent requests are merged into one model call."""
+        responses = await asyncio.gather(*[
+            self.request("POST", "/score", {"email": f"Could we talk this week about item {i}?"}) for i in range(5)])
+        self.assertTrue(all(status == 200 for status, _ in responses))
+        self.assertTrue(all(payload["results"][0]["label"] == "interested" for _, payload in responses))
+        self.assertEqual(self.model.call_count, 1)
+        self.assertEqual(len(self.model.call_args[0][0]), 5)
+
+    async def test_heuristic_emails_skip_the_model(self):
+        """Test that heuristic matches are answered without a model call and keep request order."""
+        status, payload = await self.request("POST", "/score", {"emails": ["Please unsubscribe me.",
+                                                                           "Send over the contract"]})
+        self.assertEqual(status, 200)
+        self.assertEqual([r["method"] for r in payload["results"]], ["heuristic", "model"])
+        self.assertEqual(payload["results"][0]["phrase"], "unsubscribe")
+        self.model.assert_called_once()
+
+    async def test_batch_size_limit(self):
+        """Test that a request larger than max_batch_size is split across model calls."""
+        status, payload = await self.request("POST", "/score", {"emails": [f"Reply {i}" for i in range(20)]})
+        self.assertEqual(status, 200)
+        self.assertEqual(len(payload["results"]), 20)
+        self.assertTrue(all(len(call[0][0]) <= 8 for call in self.model.call_args_list))
+
+    async def test_prepare_runs_off_the_event_loop(self):
+        """Test that normalization and heuristics run on a worker thread, not the event loop thread."""
+        threads = []
+        original = sa.prepare_email
+
+        def prepare_email(email_id, content):
+            threads.append(threading.current_thread())
+            return original(email_id, content)
+
+        with patch.object(sa, "prepare_email", side_effect=prepare_email):
+            status, _ = await self.request("POST", "/score", {"emails": ["Please unsubscribe me.", "Reply"]})
+        self.assertEqual(status, 200)
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    async def test_metrics_endpoint(self):
+        """Test that scored requests show up in the Prometheus metrics."""
+        metrics.reset()
+        await self.request("POST", "/score", {"emails": ["Please unsubscribe me.", "Send over the contract"]})
+        status, text = await self.request("GET", "/metrics")
+        self.assertEqual(status, 200)
+        self.assertIn('email_sentiment_heuristic_phrase_hits_total{phrase="unsubscribe"} 1', text)
+        self.assertIn('email_sentiment_model_calls_total 1', text)
+        self.assertIn('email_sentiment_emails_by_label_total{label="interested"} 1', text)
+
+    async def test_errors(self):
+        """Test bad requests, unknown paths and model failures."""
+        self.assertEqual((await self.request("POST", "/score", {"text": "x"}))[0], 400)
+        self.assertEqual((await self.request("GET", "/score"))[0], 405)
+        self.assertEqual((await self.request("GET", "/missing"))[0], 404)
+        self.model.side_effect = RuntimeError("Model error")
+        self.assertEqual((await self.request("POST", "/score", {"email": "Send over the contract"}))[0], 500)
+        status, payload = await self.request("GET", "/health")
+        self.assertEqual((status, payload["status"]), (200, "ok"))
+
+if __name__ == '__main__':
+    unittest.main()